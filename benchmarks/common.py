@@ -0,0 +1,116 @@
+"""
+Helpers shared by the benchmarks: wide models and the JSON report.
+"""
+
+from typing import Callable, Dict, List, Optional, Type
+import argparse
+import datetime
+import decimal
+import json
+import os
+import platform
+import sys
+import timeit
+
+# Benchmark the checkout the benchmarks are in, installed or not.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import postDB  # noqa: E402
+from postDB import Model, Column, types  # noqa: E402
+
+#: Model sizes, in columns, the benchmarks are run at.
+SIZES = (3, 10, 50, 200)
+
+
+def column_for(i: int) -> Column:
+    """Returns the ``i``-th non key column of a wide model, cycling through the common types."""
+    kinds = (
+        lambda: Column(types.String, nullable=True),
+        lambda: Column(types.Integer(big=True), nullable=True),
+        lambda: Column(types.Boolean, default=False),
+        lambda: Column(types.DateTime(timezone=True), nullable=True),
+        lambda: Column(types.Numeric(precision=12, scale=2), nullable=True),
+    )
+    return kinds[i % len(kinds)]()
+
+
+def value_for(column: Column, row: int):
+    """Returns a value for ``column`` of the ``row``-th generated row."""
+    python = column.column_type.python
+    if python is str:
+        return "value %d" % row
+    if python is int:
+        return row
+    if python is bool:
+        return row % 2 == 0
+    if python is datetime.datetime:
+        return datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    if python is decimal.Decimal:
+        return decimal.Decimal(row) / 100
+    return None
+
+
+def wide_model(size: int, *, slots: bool = False) -> Type[Model]:
+    """Returns a model with a serial primary key and ``size - 1`` other columns."""
+    attrs = {"id": Column(types.Serial, primary_key=True)}
+    for i in range(size - 1):
+        attrs["col_%d" % i] = column_for(i)
+
+    name = "Wide%d%s" % (size, "Slots" if slots else "")
+    return type(Model)(
+        name, (Model,), attrs, tablename="bench_wide_%d" % size, slots=slots
+    )
+
+
+def row_for(model: Type[Model], row: int) -> dict:
+    """Returns the attributes of the ``row``-th generated row of ``model``."""
+    return {
+        col.name: value_for(col, row)
+        for col in model.columns
+        if not isinstance(col.column_type, types.Serial)
+    }
+
+
+def ns_per_op(func: Callable[[], object], *, number: int, repeat: int = 5) -> float:
+    """Returns the best time of ``repeat`` runs of ``number`` calls, in nanoseconds per call."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e9
+
+
+def parser(description: str, *, sizes: bool = True) -> argparse.ArgumentParser:
+    """Returns a argument parser with the options shared by the benchmarks,
+    ``--sizes`` only for the benchmarks of models when ``sizes`` is ``True``."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Write the results as JSON to this file instead of stdout.",
+    )
+    if sizes:
+        parser.add_argument(
+            "--sizes",
+            type=lambda value: tuple(int(size) for size in value.split(",")),
+            default=SIZES,
+            help="Comma separated model sizes, in columns (default: %(default)s).",
+        )
+    return parser
+
+
+def report(suite: str, results: List[Dict], output: Optional[str] = None) -> None:
+    """Write the results of a suite as JSON, with the environment they were measured in."""
+    data = {
+        "suite": suite,
+        "postDB": postDB.__version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "results": results,
+    }
+
+    if output is None:
+        json.dump(data, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+
+    with open(output, "w") as f:
+        json.dump(data, f, indent=2)
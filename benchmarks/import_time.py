@@ -0,0 +1,94 @@
+"""
+Check the time ``import postDB`` takes, measured with ``python -X importtime``.
+
+Fails when a module that should be imported lazily is imported, or when the
+import takes longer than ``--max-ms``. Results are written as JSON::
+
+    python benchmarks/import_time.py --max-ms 50 --output import_time.json
+"""
+
+from typing import Dict
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from common import report
+
+#: Modules only needed once a pool is created or a type is deserialized.
+LAZY = ("asyncpg", "asyncio", "pydoc", "inspect", "ssl")
+
+CHECK = "import sys, postDB; print(','.join(m for m in %r if m in sys.modules))" % (
+    LAZY,
+)
+
+
+def measure() -> Dict:
+    """Returns the cumulative import time of every module, in microseconds,
+    and the lazy modules that were imported, from a fresh interpreter."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHECK],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+
+    imported = [name for name in result.stdout.strip().split(",") if name]
+    return {"times": times, "imported": imported}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-o", "--output", help="Write the results as JSON to this file."
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--max-ms", type=float, help="Fail if the median import time is above this."
+    )
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    totals = [run["times"]["postDB"] / 1000 for run in runs]
+    imported = sorted({name for run in runs for name in run["imported"]})
+    slowest = sorted(runs[-1]["times"].items(), key=lambda item: item[1])[-10:]
+
+    median = statistics.median(totals)
+    report(
+        "import_time",
+        [
+            {
+                "name": "import postDB",
+                "median_ms": median,
+                "min_ms": min(totals),
+                "lazy_modules_imported": imported,
+                "slowest_us": dict(reversed(slowest)),
+            }
+        ],
+        args.output,
+    )
+
+    failures = []
+    if imported:
+        failures.append("imported lazily loaded modules: " + ", ".join(imported))
+    if args.max_ms is not None and median > args.max_ms:
+        failures.append("took %.1f ms, more than %.1f ms" % (median, args.max_ms))
+
+    if failures:
+        raise SystemExit("import postDB " + " and ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
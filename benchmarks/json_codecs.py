@@ -0,0 +1,71 @@
+"""
+Benchmark the encode and decode throughput of the JSON serializers
+usable with :class:`postDB.codecs.JSONCodec`, the ones not installed are skipped::
+
+    python benchmarks/json_codecs.py --output json.json
+"""
+
+from typing import Dict, List
+import json
+
+# Puts the checkout on sys.path, before postDB is imported.
+from common import ns_per_op, parser, report
+
+from postDB.codecs import JSONCodec
+
+DOCUMENTS = {
+    "small": {"id": 1, "name": "frank", "verified": True},
+    "medium": {
+        "id": 1,
+        "tags": ["python", "postgres", "asyncio"] * 5,
+        "settings": {"theme": "dark", "limits": {"a": 1.5, "b": None}},
+        "history": [{"at": i, "event": "login"} for i in range(20)],
+    },
+    "large": {
+        "rows": [{"id": i, "value": "x" * 20, "n": i * 1.5} for i in range(2000)]
+    },
+}
+
+
+def serializers() -> Dict[str, JSONCodec]:
+    codecs = {"json": JSONCodec(json.dumps, json.loads)}
+
+    for name in ("ujson", "orjson"):
+        try:
+            module = __import__(name)
+        except ImportError:
+            continue
+        codecs[name] = JSONCodec(module.dumps, module.loads)
+
+    return codecs
+
+
+def main():
+    args = parser(__doc__.strip().splitlines()[0], sizes=False).parse_args()
+
+    results: List[Dict] = []
+    for name, codec in serializers().items():
+        for size, document in DOCUMENTS.items():
+            encoded = codec.encode_jsonb(document)
+            number = max(10, 2_000_000 // len(encoded))
+
+            for operation, func in (
+                ("encode", lambda: codec.encode_jsonb(document)),
+                ("decode", lambda: codec.decode_jsonb(encoded)),
+            ):
+                time = ns_per_op(func, number=number)
+                results.append(
+                    {
+                        "name": "%s %s" % (name, operation),
+                        "document": size,
+                        "bytes": len(encoded),
+                        "ns_per_op": time,
+                        "mb_per_second": len(encoded) / time * 1e3,
+                    }
+                )
+
+    report("json_codecs", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
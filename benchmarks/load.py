@@ -0,0 +1,113 @@
+"""
+Benchmark end-to-end throughput against a local PostgreSQL database.
+
+Creates and drops a ``bench_wide_<size>`` table per model size,
+results are written as JSON::
+
+    python benchmarks/load.py --dsn postgresql://localhost/postdb_bench --output load.json
+
+The database uri can also be given with the ``POSTGRES_URI`` environment variable.
+"""
+
+from typing import Dict, List, Type
+import asyncio
+import os
+import time
+
+# Puts the checkout on sys.path, before postDB is imported.
+from common import parser, report, row_for, wide_model
+
+from postDB import Model
+
+
+async def timed(name: str, size: int, rows: int, coro) -> Dict:
+    start = time.perf_counter()
+    await coro
+    elapsed = time.perf_counter() - start
+    return {
+        "name": name,
+        "columns": size,
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed,
+    }
+
+
+async def insert(model: Type[Model], rows: List[dict]) -> None:
+    # postDB has no single row insert, time the INSERT round trip
+    # the bulk methods are compared against.
+    names = list(rows[0])
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        model.__tablename__,
+        ", ".join(names),
+        ", ".join("$%d" % i for i in range(1, len(names) + 1)),
+    )
+    for row in rows:
+        await model.pool.execute(sql, *(row[name] for name in names))
+
+
+async def fetch(model: Type[Model], *, lazy: bool) -> None:
+    await model.select().fetch(lazy=lazy)
+
+
+async def stream(model: Type[Model], batch_size: int) -> None:
+    async for _ in model.stream(batch_size=batch_size):
+        pass
+
+
+async def bench_model(size: int, rows: int) -> List[Dict]:
+    model = wide_model(size)
+    generated = [row_for(model, i) for i in range(rows)]
+    inserts = generated[: max(1, rows // 10)]
+
+    await model.drop_table()
+    await model.create_table()
+    try:
+        results = [
+            await timed("insert", size, len(inserts), insert(model, inserts)),
+        ]
+
+        await model.pool.execute("TRUNCATE %s" % model.__tablename__)
+        results.append(
+            await timed("bulk_insert", size, rows, model.bulk_insert(generated))
+        )
+        results.append(
+            await timed("fetch and hydrate", size, rows, fetch(model, lazy=False))
+        )
+        results.append(await timed("fetch, lazy", size, rows, fetch(model, lazy=True)))
+        results.append(
+            await timed("stream", size, rows, stream(model, batch_size=1000))
+        )
+    finally:
+        await model.drop_table()
+
+    return results
+
+
+async def main():
+    options = parser(__doc__.strip().splitlines()[0])
+    options.add_argument("--dsn", default=os.environ.get("POSTGRES_URI"))
+    options.add_argument(
+        "--rows",
+        type=int,
+        default=100_000,
+        help="Rows per model size (default: %(default)s).",
+    )
+    args = options.parse_args()
+
+    if args.dsn is None:
+        raise SystemExit("A database uri is required, pass --dsn or set POSTGRES_URI.")
+
+    await Model.create_pool(uri=args.dsn)
+    try:
+        results = []
+        for size in args.sizes:
+            results.extend(await bench_model(size, args.rows))
+    finally:
+        await Model.pool.close()
+
+    report("load", results, args.output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Benchmark the pure Python hot paths of postDB at different model sizes.
+
+Runs without a database, results are written as JSON::
+
+    python benchmarks/micro.py --output micro.json
+"""
+
+from typing import Dict, List
+
+# Puts the checkout on sys.path, before postDB is imported.
+from common import ns_per_op, parser, report, row_for, wide_model
+
+from postDB import types
+
+
+def bench_model(size: int, number: int) -> List[Dict]:
+    results = []
+
+    def add(name: str, func, number: int = number) -> None:
+        results.append(
+            {
+                "name": name,
+                "columns": size,
+                "ns_per_op": ns_per_op(func, number=number),
+            }
+        )
+
+    for slots in (False, True):
+        model = wide_model(size, slots=slots)
+        attrs = row_for(model, 1)
+        suffix = ", slots" if slots else ""
+
+        add("Model.__init__" + suffix, lambda: model(**attrs))
+
+        instance = model(**attrs)
+        names = [col.name for col in model.columns[:3]]
+        add("Model.as_dict" + suffix, lambda: instance.as_dict())
+        add("Model.as_dict, 3 columns" + suffix, lambda: instance.as_dict(*names))
+
+    def create_table_sql() -> str:
+        # create_table_sql is memoized, time the generation of the DDL.
+        model._query_cache.clear()
+        return model.create_table_sql()
+
+    add("Model.create_table_sql", create_table_sql, number // 10 or 1)
+    add("Model.create_table_sql, cached", model.create_table_sql)
+
+    dumped = [col.column_type.to_dict() for col in model.columns]
+    add(
+        "SQLType.to_dict",
+        lambda: [col.column_type.to_dict() for col in model.columns],
+    )
+    add(
+        "SQLType.from_dict",
+        lambda: [types.SQLType.from_dict(dict(data)) for data in dumped],
+    )
+
+    return results
+
+
+def main():
+    args = parser(__doc__.strip().splitlines()[0]).parse_args()
+
+    results = []
+    for size in args.sizes:
+        # Keep the total work per size roughly constant.
+        number = max(100, 200_000 // size)
+        results.extend(bench_model(size, number))
+
+    report("micro", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
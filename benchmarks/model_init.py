@@ -0,0 +1,73 @@
+"""
+Benchmark the time and memory it takes to create Model instances.
+
+Compares the generic ``Model.__init__`` (looping over every column)
+with the constructor compiled by ``ModelMeta``, with and without ``slots=True``.
+"""
+
+import timeit
+import tracemalloc
+
+from postDB import Model, Column, types
+
+
+class User(Model):
+    id = Column(types.Serial, primary_key=True)
+    username = Column(types.String)
+    email = Column(types.String, unique=True)
+    bio = Column(types.String, nullable=True)
+    verified = Column(types.Boolean, default=False)
+
+
+class SlottedUser(Model, slots=True, tablename="users"):
+    id = Column(types.Serial, primary_key=True)
+    username = Column(types.String)
+    email = Column(types.String, unique=True)
+    bio = Column(types.String, nullable=True)
+    verified = Column(types.Boolean, default=False)
+
+
+ATTRS = {"id": 1, "username": "frank", "email": "frank@doesnotexist"}
+AMOUNT = 100_000
+
+
+def generic(cls):
+    def create():
+        self = cls.__new__(cls)
+        Model.__init__(self, **ATTRS)
+        return self
+
+    return create
+
+
+def compiled(cls):
+    return lambda: cls(**ATTRS)
+
+
+def per_instance_time(factory) -> float:
+    runs = timeit.repeat(factory, number=AMOUNT, repeat=5)
+    return min(runs) / AMOUNT * 1e9
+
+
+def per_instance_memory(factory) -> float:
+    tracemalloc.start()
+    instances = [factory() for _ in range(AMOUNT)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del instances
+    return size / AMOUNT
+
+
+if __name__ == "__main__":
+    cases = (
+        ("generic __init__", generic(User)),
+        ("compiled __init__", compiled(User)),
+        ("compiled __init__, slots", compiled(SlottedUser)),
+    )
+
+    print("%-26s %12s %12s" % ("", "ns/instance", "B/instance"))
+    for name, factory in cases:
+        print(
+            "%-26s %12.0f %12.0f"
+            % (name, per_instance_time(factory), per_instance_memory(factory))
+        )
@@ -0,0 +1,84 @@
+"""
+Benchmark the Python side overhead of the query paths of postDB.
+
+Queries are answered in-process by :class:`postDB.testing.FakePool`,
+so the results exclude the network and the database::
+
+    python benchmarks/overhead.py --output overhead.json
+"""
+
+from itertools import count
+from typing import Dict, List
+import asyncio
+import time
+
+# Puts the checkout on sys.path, before postDB is imported.
+from common import parser, report, row_for, wide_model
+
+from postDB import Model
+from postDB.testing import FakePool, generate_rows
+
+ROWS = 1000
+
+
+async def per_op(name: str, size: int, coro_factory, number: int) -> Dict:
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(number):
+            await coro_factory()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {"name": name, "columns": size, "ns_per_op": best / number * 1e9}
+
+
+async def bench_model(size: int) -> List[Dict]:
+    model = wide_model(size)
+    records = generate_rows(model, ROWS)
+    rows = [row_for(model, i) for i in range(ROWS)]
+    Model.pool = FakePool(records)
+
+    async def stream():
+        async for _ in model.stream(batch_size=100):
+            pass
+
+    async def save():
+        instance.col_0 = "changed %d" % next(counter)
+        await instance.save()
+
+    instance = model.from_record(records[0])
+    counter = count()
+    number = max(10, 2000 // size)
+
+    return [
+        await per_op(
+            "fetch %d rows" % ROWS, size, lambda: model.select().fetch(), number
+        ),
+        await per_op(
+            "fetch %d rows, lazy" % ROWS,
+            size,
+            lambda: model.select().fetch(lazy=True),
+            number,
+        ),
+        await per_op("fetchrow", size, lambda: model.where(id=1).fetchrow(), number),
+        await per_op("stream %d rows" % ROWS, size, stream, number),
+        await per_op("save", size, save, number),
+        await per_op(
+            "bulk_insert %d rows" % ROWS, size, lambda: model.bulk_insert(rows), number
+        ),
+    ]
+
+
+async def main():
+    args = parser(__doc__.strip().splitlines()[0]).parse_args()
+
+    results = []
+    for size in args.sizes:
+        results.extend(await bench_model(size))
+
+    report("overhead", results, args.output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+"""
+Test inserting many rows at once with the binary COPY protocol.
+"""
+
+from postDB import Model, Column, types
+
+import asyncio
+
+DB_URI: str = "..."
+# PostgreSQL database uri.
+# Must be provided to run the example.
+
+
+class User(Model):
+    id = Column(types.Serial, primary_key=True)
+    username = Column(types.String)
+    email = Column(types.String, unique=True)
+    verified = Column(types.Boolean, default=False)
+
+
+def generate_users(amount: int):
+    for i in range(amount):
+        yield {"username": "user%s" % i, "email": "user%s@doesnotexist" % i}
+
+
+async def main():
+    await Model.create_pool(uri=DB_URI)
+    await User.create_table(verbose=True)
+
+    inserted = await User.bulk_insert(generate_users(100_000), chunk_size=5000)
+    print("Inserted %s users." % inserted)
+
+    await User.drop_table()
+    await Model.pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.get_event_loop().run_until_complete(main())
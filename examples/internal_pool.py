@@ -51,7 +51,8 @@ async def main():
     except exceptions.UniqueViolationError as e:
         print("[!] ERROR: ", e)
 
-    print(await Model.pool.fetch("SELECT * FROM users"))
+    users = User.from_records(await Model.pool.fetch("SELECT * FROM users"))
+    print([user.as_dict() for user in users])
 
     try:
         await asyncio.wait_for(Model.pool.close(), timeout=10.0)
@@ -10,6 +10,10 @@ from collections import namedtuple
 from postDB.model.column import Column
 from postDB.model.model import Model
 from postDB.model.index import Index
+from postDB.model.partition import Partitioning
+from postDB.model.query import Query
+from postDB.model.cache import ModelCache
+from postDB.instrumentation import metrics, QueryBudget
 
 
 VersionInfo = namedtuple("VersionInfo", "major minor micro releaselevel serial")
@@ -26,4 +30,4 @@ version_info = VersionInfo(*VERSION)
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
 
-__all__ = (Column, Model, Index)
+__all__ = (Column, Model, Index, Partitioning, Query, ModelCache, metrics, QueryBudget)
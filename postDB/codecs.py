@@ -0,0 +1,93 @@
+from typing import Any, Callable, Optional, Union, TYPE_CHECKING
+import json
+
+if TYPE_CHECKING:
+    from asyncpg import Connection
+
+
+#: Version prefix of the binary format of ``jsonb``.
+JSONB_VERSION = b"\x01"
+
+
+class JSONCodec:
+    """Encodes and decodes the ``json`` and ``jsonb`` columns of a pool.
+
+    The values are sent in the binary wire format, which skips the text
+    conversion of ``jsonb`` on the server. ``dumps`` and ``loads`` default to
+    :mod:`json`, :meth:`fastest` opts in to :mod:`orjson` or :mod:`ujson`.
+    ``dumps`` may return :class:`str` or :class:`bytes`.
+
+    .. code-block:: python3
+
+        import rapidjson
+
+        await Model.create_pool(uri, json_codec=JSONCodec(rapidjson.dumps, rapidjson.loads))
+    """
+
+    __slots__ = ("dumps", "loads", "name")
+
+    def __init__(
+        self,
+        dumps: Optional[Callable[[Any], Union[str, bytes]]] = None,
+        loads: Optional[Callable[[Union[str, bytes]], Any]] = None,
+    ):
+        if (dumps is None) != (loads is None):
+            raise ValueError("dumps and loads must be given together.")
+
+        if dumps is None:
+            self.name, dumps, loads = "json", json.dumps, json.loads
+        else:
+            self.name = getattr(dumps, "__module__", None) or "custom"
+
+        self.dumps = dumps
+        self.loads = loads
+
+    @classmethod
+    def fastest(cls) -> "JSONCodec":
+        """Returns a codec using the fastest installed serializer of :mod:`orjson`
+        and :mod:`ujson`, falling back to :mod:`json`.
+
+        They don't encode everything :func:`json.dumps` does, :mod:`orjson`
+        rejects dicts with keys which aren't strings for example."""
+        for name in ("orjson", "ujson"):
+            try:
+                module = __import__(name)
+            except ImportError:
+                continue
+            return cls(module.dumps, module.loads)
+
+        return cls()
+
+    def encode_json(self, value: Any) -> bytes:
+        data = self.dumps(value)
+        if isinstance(data, str):
+            return data.encode()
+        return data
+
+    def decode_json(self, data: bytes) -> Any:
+        return self.loads(data)
+
+    def encode_jsonb(self, value: Any) -> bytes:
+        return JSONB_VERSION + self.encode_json(value)
+
+    def decode_jsonb(self, data: bytes) -> Any:
+        if data[:1] != JSONB_VERSION:
+            raise ValueError("Unsupported jsonb format version %r." % data[:1])
+        return self.loads(data[1:])
+
+    async def register(self, con: "Connection") -> None:
+        """Set the codecs on a connection, usable as the ``init`` of a pool."""
+        await con.set_type_codec(
+            "json",
+            schema="pg_catalog",
+            encoder=self.encode_json,
+            decoder=self.decode_json,
+            format="binary",
+        )
+        await con.set_type_codec(
+            "jsonb",
+            schema="pg_catalog",
+            encoder=self.encode_jsonb,
+            decoder=self.decode_jsonb,
+            format="binary",
+        )
@@ -8,3 +8,9 @@ class UniqueViolationError(SchemaError):
     """Raised when a unique constraint is violated."""
 
     pass
+
+
+class QueryBudgetExceeded(SchemaError):
+    """Raised when a :class:`~postDB.instrumentation.QueryBudget` is exceeded."""
+
+    pass
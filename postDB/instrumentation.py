@@ -0,0 +1,362 @@
+from bisect import bisect_left
+from collections import Counter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Tuple, List, Any, AsyncIterator, Literal
+import logging
+import time
+
+from postDB.exceptions import QueryBudgetExceeded
+
+log = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, in seconds."""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    #: Upper bounds of the buckets, the last bucket is unbounded.
+    buckets: Tuple[float, ...] = (
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+    )
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        """Record a value."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def to_dict(self) -> dict:
+        """Returns the histogram as a dict, ``buckets`` maps upper bounds to counts."""
+        bounds = [str(bound) for bound in self.buckets] + ["inf"]
+        return {
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "buckets": dict(zip(bounds, self.counts)),
+        }
+
+
+class StatementStats:
+    """Statistics of a single statement of a model."""
+
+    __slots__ = ("model", "statement", "latency", "rows")
+
+    def __init__(self, model: str, statement: str):
+        self.model = model
+        self.statement = statement
+        self.latency = Histogram()
+        self.rows = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "statement": self.statement,
+            "rows": self.rows,
+            "latency": self.latency.to_dict(),
+        }
+
+
+class Metrics:
+    """Collects timings of the queries postDB makes, disabled by default.
+
+    When disabled the cost is a single attribute check per query.
+
+    .. code-block:: python3
+
+        from postDB import metrics
+
+        metrics.enable(slow_query_threshold=0.2)
+        ...
+        print(metrics.to_dict())
+    """
+
+    def __init__(self):
+        self.enabled = False
+        #: Queries slower than this many seconds are logged, ``None`` to disable.
+        self.slow_query_threshold: Optional[float] = None
+        self.statements: Dict[Tuple[str, str], StatementStats] = {}
+        #: Time spent waiting for a connection from a pool.
+        self.acquire = Histogram()
+
+    def enable(self, *, slow_query_threshold: Optional[float] = None) -> None:
+        """Start collecting metrics."""
+        self.enabled = True
+        self.slow_query_threshold = slow_query_threshold
+
+    def disable(self) -> None:
+        """Stop collecting metrics, the collected ones are kept."""
+        self.enabled = False
+
+    def reset(self) -> None:
+        """Forget every collected metric."""
+        self.statements.clear()
+        self.acquire = Histogram()
+
+    def record(self, model: str, statement: str, elapsed: float, rows: int) -> None:
+        """Record an executed statement."""
+        key = (model, statement)
+        try:
+            stats = self.statements[key]
+        except KeyError:
+            stats = self.statements[key] = StatementStats(model, statement)
+
+        stats.latency.observe(elapsed)
+        stats.rows += rows
+
+        threshold = self.slow_query_threshold
+        if threshold is not None and elapsed >= threshold:
+            log.warning(
+                "Slow query on %s (%.1f ms, %d rows): %s",
+                model,
+                elapsed * 1000,
+                rows,
+                statement,
+            )
+
+    @staticmethod
+    def pool_stats() -> List[dict]:
+        """Returns the connection gauges of every pool of every model."""
+        from postDB.model.model import Model
+
+        pools = []
+        seen = set()
+
+        def add(role: str, owner: str, pool) -> None:
+            if pool is None or id(pool) in seen:
+                return
+            seen.add(id(pool))
+
+            size = pool.get_size()
+            idle = pool.get_idle_size()
+            pools.append(
+                {
+                    "model": owner,
+                    "role": role,
+                    "size": size,
+                    "idle": idle,
+                    "in_use": size - idle,
+                    "max_size": pool.get_max_size(),
+                }
+            )
+
+        for model in [Model, *Model._walk_models()]:
+            add("primary", model.__name__, model.pool)
+            for replica in model.replicas:
+                add("replica", model.__name__, replica)
+            for shard in model.shards:
+                add("shard", model.__name__, shard)
+
+        return pools
+
+    def to_dict(self) -> dict:
+        """Returns every collected metric as a dict."""
+        return {
+            "statements": [stats.to_dict() for stats in self.statements.values()],
+            "acquire": self.acquire.to_dict(),
+            "pools": self.pool_stats(),
+        }
+
+
+metrics = Metrics()
+
+
+class QueryBudget:
+    """Records every query postDB makes in its scope, and enforces limits on them.
+
+    The scope follows the context, so queries made by tasks started
+    inside it are included. ``max_queries`` limits the amount of queries,
+    ``max_time`` the total time spent in them (in seconds) and ``max_repeats``
+    how often the same statement may run, which with different parameters
+    is the signature of an N+1 query. With ``on_violation="raise"`` the query
+    exceeding a limit raises :exc:`~postDB.exceptions.QueryBudgetExceeded`,
+    with ``"log"`` a warning is logged instead.
+
+    .. code-block:: python3
+
+        with QueryBudget(max_queries=3, max_repeats=1) as budget:
+            posts = await Post.select().prefetch("author_id").fetch()
+
+        print(budget.count, budget.repeated())
+    """
+
+    def __init__(
+        self,
+        *,
+        max_queries: Optional[int] = None,
+        max_time: Optional[float] = None,
+        max_repeats: Optional[int] = None,
+        on_violation: Literal["raise", "log"] = "raise",
+    ):
+        if on_violation not in ("raise", "log"):
+            raise ValueError('on_violation must be one of: "raise", "log"')
+
+        self.max_queries = max_queries
+        self.max_time = max_time
+        self.max_repeats = max_repeats
+        self.on_violation = on_violation
+
+        #: The ``(model, statement, elapsed, rows)`` of every query, in order.
+        self.queries: List[Tuple[str, str, float, int]] = []
+        self.time = 0.0
+        self.counts: Counter = Counter()
+        self.violations: List[str] = []
+        self._token = None
+
+    @property
+    def count(self) -> int:
+        """The amount of queries made in the scope."""
+        return len(self.queries)
+
+    def repeated(self, threshold: int = 2) -> Dict[str, int]:
+        """Returns the statements made at least ``threshold`` times, with their counts."""
+        return {
+            statement: count
+            for statement, count in self.counts.items()
+            if count >= threshold
+        }
+
+    def __enter__(self) -> "QueryBudget":
+        self._token = _budgets.set(_budgets.get() + (self,))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _budgets.reset(self._token)
+        self._token = None
+
+    def record(self, model: str, statement: str, elapsed: float, rows: int) -> None:
+        """Record a query, checking the limits."""
+        self.queries.append((model, statement, elapsed, rows))
+        self.time += elapsed
+        self.counts[statement] += 1
+
+        if self.max_queries is not None and self.count == self.max_queries + 1:
+            self._violation(
+                "Query budget of %d queries exceeded by: %s"
+                % (self.max_queries, statement)
+            )
+
+        if (
+            self.max_time is not None
+            and self.time - elapsed <= self.max_time < self.time
+        ):
+            self._violation(
+                "Query time budget of %.1f ms exceeded by: %s"
+                % (self.max_time * 1000, statement)
+            )
+
+        repeats = self.counts[statement]
+        if self.max_repeats is not None and repeats == self.max_repeats + 1:
+            self._violation(
+                "Statement repeated %d times, possible N+1 query: %s"
+                % (repeats, statement)
+            )
+
+    def _violation(self, message: str) -> None:
+        self.violations.append(message)
+        if self.on_violation == "raise":
+            raise QueryBudgetExceeded(message)
+        log.warning(message)
+
+
+_budgets: ContextVar[Tuple[QueryBudget, ...]] = ContextVar("postDB_budgets", default=())
+
+
+def observing() -> bool:
+    """Returns a bool stating if queries are currently recorded."""
+    return metrics.enabled or bool(_budgets.get())
+
+
+def record_statement(model: str, statement: str, elapsed: float, rows: int) -> None:
+    """Record an executed statement in the metrics and the active budgets."""
+    if metrics.enabled:
+        metrics.record(model, statement, elapsed, rows)
+
+    for budget in _budgets.get():
+        budget.record(model, statement, elapsed, rows)
+
+
+def count_rows(method: str, result: Any) -> int:
+    if method == "fetch":
+        return len(result)
+    if method == "fetchrow":
+        return int(result is not None)
+    if isinstance(result, str):
+        # Command status, like "UPDATE 3" or "INSERT 0 3".
+        count = result.rpartition(" ")[2]
+        return int(count) if count.isdigit() else 0
+    return 0
+
+
+async def run(model: type, target, method: str, sql: str, *args, **kwargs) -> Any:
+    """Call ``method`` of a pool or connection with the statement ``sql``,
+    recording it when metrics are enabled or a :class:`QueryBudget` is active."""
+    if not metrics.enabled and not _budgets.get():
+        return await getattr(target, method)(sql, *args, **kwargs)
+
+    if hasattr(target, "acquire"):
+        async with acquire(target) as con:
+            return await _timed(model, con, method, sql, args, kwargs)
+
+    return await _timed(model, target, method, sql, args, kwargs)
+
+
+async def _timed(model: type, con, method: str, sql: str, args, kwargs) -> Any:
+    start = time.perf_counter()
+    rows = 0
+    try:
+        result = await getattr(con, method)(sql, *args, **kwargs)
+        rows = count_rows(method, result)
+        return result
+    finally:
+        # Statements that fail, like on a timeout, are often the slowest ones.
+        elapsed = time.perf_counter() - start
+
+        if method == "copy_records_to_table":
+            sql = "COPY %s" % sql
+
+        record_statement(model.__name__, sql, elapsed, rows)
+
+
+@asynccontextmanager
+async def acquire(pool) -> AsyncIterator[Any]:
+    """Acquire a connection from ``pool``, recording the wait when metrics are enabled."""
+    if not metrics.enabled:
+        async with pool.acquire() as con:
+            yield con
+        return
+
+    start = time.perf_counter()
+    async with pool.acquire() as con:
+        metrics.acquire.observe(time.perf_counter() - start)
+        yield con
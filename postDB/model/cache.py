@@ -0,0 +1,198 @@
+from collections import OrderedDict
+from typing import Optional, Hashable, Any, Sequence, Type, TYPE_CHECKING
+import logging
+import json
+import time
+
+if TYPE_CHECKING:
+    from asyncpg.pool import Pool
+    from postDB.model.model import Model
+
+
+log = logging.getLogger(__name__)
+
+
+class ModelCache:
+    """Size bounded LRU cache of model instances keyed by their primary key,
+    with optional time based expiry.
+
+    Pass an instance to a model with the ``cache`` class keyword,
+    :meth:`Model.get` then uses it and writes made through postDB
+    invalidate the affected entries.
+
+    .. code-block:: python3
+
+        class User(Model, cache=ModelCache(maxsize=10000, ttl=60)):
+            id = Column(types.Integer(big=True), primary_key=True)
+            username = Column(types.String)
+    """
+
+    __slots__ = ("maxsize", "ttl", "hits", "misses", "_entries")
+
+    def __init__(self, *, maxsize: int = 1024, ttl: Optional[float] = None):
+        if maxsize < 1:
+            raise ValueError("maxsize must be greater than 0")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and (entry[0] is None or entry[0] > time.monotonic())
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the cached instance for ``key``, or ``None``."""
+        try:
+            expires, value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        if expires is not None and expires <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store ``value`` for ``key``, evicting the least recently used entry if full."""
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+
+        entries = self._entries
+        entries[key] = (expires, value)
+        entries.move_to_end(key)
+
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove ``key`` from the cache."""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        self._entries.clear()
+
+    def info(self) -> dict:
+        """Returns the hit and miss counters and the current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+class CacheListener:
+    """Evicts cache entries of models on ``NOTIFY`` from their
+    :meth:`Model.notify_trigger_sql` trigger, created by :meth:`Model.listen`.
+
+    If the connection is lost notifications could be missed, so the caches
+    of the models are cleared and disabled until the listener reconnects,
+    retrying with an exponential backoff of up to ``max_delay`` seconds."""
+
+    def __init__(
+        self, pool: "Pool", models: Sequence[Type["Model"]], max_delay: float = 30.0
+    ):
+        self.pool = pool
+        self.models = {model.notify_channel(): model for model in models}
+        self.max_delay = max_delay
+        self.connection = None
+        self._suspended = {}
+        self._reconnecting = None
+
+    async def start(self) -> None:
+        """Acquire a connection and start listening."""
+        self.connection = con = await self.pool.acquire()
+        try:
+            con.add_termination_listener(self._on_termination)
+            for channel in self.models:
+                await con.add_listener(channel, self._on_notify)
+        except BaseException:
+            self.connection = None
+            await self.pool.release(con)
+            raise
+
+    async def close(self) -> None:
+        """Stop listening and release the connection back to the pool."""
+        task, self._reconnecting = self._reconnecting, None
+        if task is not None:
+            task.cancel()
+        self._resume()
+
+        con, self.connection = self.connection, None
+        if con is None:
+            return
+
+        for channel in self.models:
+            await con.remove_listener(channel, self._on_notify)
+
+        con.remove_termination_listener(self._on_termination)
+        await self.pool.release(con)
+
+    def _on_notify(self, con, pid: int, channel: str, payload: str) -> None:
+        model = self.models.get(channel)
+        if model is None:
+            return
+
+        key = json.loads(payload)
+        pks = [model.schema.by_name[name] for name in model.schema.primary_key]
+
+        # Values are sent as JSON, only scalars survive the round trip
+        # with the same type, otherwise drop everything to be safe.
+        if all(col.column_type.python in (int, str, bool, float) for col in pks):
+            model.invalidate(*key)
+        else:
+            model.invalidate()
+
+    def _on_termination(self, con) -> None:
+        import asyncio
+
+        log.warning(
+            "Cache listener connection lost, caching is disabled until it reconnects."
+        )
+        self.connection = None
+        for model in self.models.values():
+            if model.cache is not None:
+                model.invalidate()
+                self._suspended[model] = model.cache
+                model.cache = None
+
+        if self._reconnecting is None:
+            self._reconnecting = asyncio.ensure_future(self._reconnect())
+
+    def _resume(self) -> None:
+        for model, cache in self._suspended.items():
+            model.cache = cache
+        self._suspended.clear()
+
+    async def _reconnect(self) -> None:
+        import asyncio
+
+        delay = 0.5
+        while True:
+            try:
+                await self.start()
+            except Exception:
+                log.warning(
+                    "Cache listener failed to reconnect, retrying in %.1f seconds.",
+                    delay,
+                    exc_info=True,
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_delay)
+            else:
+                break
+
+        self._reconnecting = None
+        self._resume()
+        log.info("Cache listener reconnected, caching is enabled again.")
@@ -3,7 +3,6 @@ from postDB.types import SQLType, String
 from postDB.model.index import Index
 
 from typing import Optional, Union, Type, Any
-import inspect
 
 
 class Column:
@@ -31,7 +30,7 @@ class Column:
         nullable: bool = False,
         unique: bool = False
     ):
-        if inspect.isclass(column_type):
+        if isinstance(column_type, type):
             column_type = column_type()
 
         if not isinstance(column_type, SQLType):
@@ -52,6 +51,11 @@ class Column:
             index = Index()
 
         if isinstance(index, Index):
+            if index.columns:
+                raise SchemaError(
+                    "An index given to a Column indexes that column, "
+                    "assign it in the Model to index other columns."
+                )
             index.column = self
 
         self.column_type = column_type
@@ -69,19 +73,34 @@ class Column:
                 "'unique', 'primary_key', and 'default' are mutually exclusive."
             )
 
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        # Only reached when the instance has no value for this column,
+        # which can be a lazily hydrated instance.
+        return instance.__getattr__(self.name)
+
+    def default_sql(self) -> Optional[str]:
+        """Returns the SQL of the default value, or ``None`` without a default."""
+        default = self.default
+        if default is None:
+            return None
+
+        if isinstance(default, str) and isinstance(self.column_type, String):
+            return "'%s'" % default
+        if isinstance(default, bool):
+            return str(default).upper()
+        return "(%s)" % default
+
     def generate_create_table_sql(self) -> str:
         """Generates the SQL for this column for the ``CREATE TABLE`` statement."""
         builder = [self.name, self.column_type.to_sql()]
 
-        default = self.default
+        default = self.default_sql()
         if default is not None:
             builder.append("DEFAULT")
-            if isinstance(default, str) and isinstance(self.column_type, String):
-                builder.append("'%s'" % default)
-            elif isinstance(default, bool):
-                builder.append(str(default).upper())
-            else:
-                builder.append("(%s)" % default)
+            builder.append(default)
 
         elif self.unique:
             builder.append("UNIQUE")
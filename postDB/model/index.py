@@ -1,21 +1,61 @@
-from typing import Literal, Optional
+from typing import Literal, Optional, Sequence, Tuple
+
+from postDB.exceptions import SchemaError
 
 
 class Index:
-    """Class to define a index in a :class:`Model`."""
+    """Class to define a index in a :class:`Model`.
+
+    Passed to a :class:`Column` with ``index=`` it indexes that column.
+    Assigned in the body of a :class:`Model` it can index multiple columns
+    or expressions (any entry containing parentheses, like ``"lower(email)"``).
+
+    ``unique`` defaults to ``True`` for btree indexes, the only
+    method supporting it, and to ``False`` for the others.
+
+    ``where`` makes a partial index, ``include`` adds non-key columns
+    for index-only scans and ``concurrently`` builds the index
+    without blocking writes to the table.
+
+    .. code-block:: python3
 
-    __slots__ = ("order", "method", "unique", "column", "__name")
+        class Post(Model):
+            id = Column(types.Integer, primary_key=True)
+            author_id = Column(types.ForeignKey("users", "id"))
+            created_at = Column(types.DateTime)
+            deleted = Column(types.Boolean, default=False)
+
+            by_author = Index(
+                "author_id", "created_at", unique=False, include=["id"], where="NOT deleted"
+            )
+    """
+
+    __slots__ = (
+        "order",
+        "method",
+        "unique",
+        "column",
+        "columns",
+        "where",
+        "include",
+        "concurrently",
+        "model",
+        "name",
+    )
 
     def __init__(
         self,
-        *,
-        method: Literal["btree", "hash", "gist", "gin"] = "btree",
+        *columns: str,
+        method: Literal["btree", "hash", "gist", "gin", "brin", "spgist"] = "btree",
         order: Literal["ASC", "DESC"] = "ASC",
         name: Optional[str] = None,
-        unique: bool = True,
+        unique: Optional[bool] = None,
+        where: Optional[str] = None,
+        include: Sequence[str] = (),
+        concurrently: bool = False,
     ):
 
-        methods = ("btree", "hash", "gist", "gin")
+        methods = ("btree", "hash", "gist", "gin", "brin", "spgist")
         assert method in methods, "Invalid index method, must be one of: " + ", ".join(
             methods
         )
@@ -25,44 +65,96 @@ class Index:
             orders
         )
 
+        if unique is None:
+            unique = method == "btree"
+        elif unique and method != "btree":
+            raise SchemaError("Only btree indexes can be unique.")
+
+        if method == "hash" and len(columns) > 1:
+            raise SchemaError("hash indexes can only have a single column.")
+
         self.column = None
-        self.__name = None
+        self.model = None
 
-        self.name: str = name
+        self.columns: Tuple[str, ...] = columns
+        #: Defaults to ``<table>_<columns>_idx``, set when the model is created.
+        self.name: Optional[str] = name
         self.order: str = order
         self.method: str = method
         self.unique: bool = unique
+        self.where: Optional[str] = where
+        self.include: Tuple[str, ...] = tuple(include)
+        self.concurrently: bool = concurrently
+
+    @staticmethod
+    def is_expression(entry: str) -> bool:
+        """Returns a bool stating if an entry of :attr:`columns` is an expression."""
+        return "(" in entry
 
     @property
-    def name(self) -> str:
-        """Default name impl."""
-        if self.__name is None:
-            default = "%s_%s_idx" % (self.column.model.__tablename__, self.column.name)
-            self.name = default
+    def elements(self) -> Tuple[str, ...]:
+        """The indexed columns and expressions."""
+        if self.columns:
+            return self.columns
+        return (self.column.name,)
+
+    def default_name(self) -> str:
+        """Returns the name of the index when none was given."""
+        names = [
+            "".join(c if c.isalnum() else "_" for c in entry).strip("_")
+            for entry in self.elements
+        ]
+        return "%s_%s_idx" % (self.model.__tablename__, "_".join(names))
 
-        return self.__name
+    def generate_create_table_sql(
+        self, *, exists_ok: bool = False, concurrently: Optional[bool] = None
+    ) -> str:
+        """Generates the SQL for this index.
 
-    @name.setter
-    def name(self, value: str):
-        self.__name = value
+        ``concurrently`` overrides :attr:`concurrently` when given.
+        Indexes of partitioned tables are never created concurrently."""
+        if concurrently is None:
+            concurrently = self.concurrently
+        if self.model is not None and self.model.partitioning is not None:
+            concurrently = False
 
-    def generate_create_table_sql(self) -> str:
-        """Generates the SQL for this index."""
         builder = ["CREATE"]
 
         if self.unique:
             builder.append("UNIQUE")
 
+        builder.append("INDEX")
+
+        if concurrently:
+            builder.append("CONCURRENTLY")
+
+        if exists_ok:
+            builder.append("IF NOT EXISTS")
+
+        elements = []
+        for entry in self.elements:
+            if self.is_expression(entry):
+                entry = "(%s)" % entry
+            # Only btree supports ordering.
+            if self.method == "btree":
+                entry += " " + self.order
+            elements.append(entry)
+
         builder.extend(
             [
-                "INDEX",
                 self.name,
                 "ON",
-                self.column.model.__tablename__,
+                self.model.__tablename__,
                 "USING",
                 self.method,
-                f"({self.column.name} {self.order})",
+                "(%s)" % ", ".join(elements),
             ]
         )
 
+        if self.include:
+            builder.append("INCLUDE (%s)" % ", ".join(self.include))
+
+        if self.where:
+            builder.append("WHERE %s" % self.where)
+
         return " ".join(builder) + ";"
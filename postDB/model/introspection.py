@@ -0,0 +1,494 @@
+from typing import (
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TYPE_CHECKING,
+)
+import hashlib
+import logging
+import re
+
+from postDB.exceptions import SchemaError
+from postDB.model.column import Column
+from postDB.model.index import Index
+from postDB import types
+
+if TYPE_CHECKING:
+    from postDB.model.model import Model
+
+
+log = logging.getLogger(__name__)
+
+#: Table storing the fingerprint of every synced model.
+FINGERPRINT_TABLE = "postdb_schema"
+
+COLUMNS_SQL = """
+SELECT c.relname AS table, a.attname AS name,
+       format_type(a.atttypid, a.atttypmod) AS type,
+       a.attnotnull AS not_null,
+       pg_get_expr(d.adbin, d.adrelid) AS default
+FROM pg_attribute a
+JOIN pg_class c ON c.oid = a.attrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+WHERE c.relname = ANY($1::TEXT[]) AND c.relkind IN ('r', 'p')
+  AND n.nspname = current_schema() AND a.attnum > 0 AND NOT a.attisdropped
+ORDER BY c.relname, a.attnum
+"""
+
+CONSTRAINTS_SQL = """
+SELECT c.relname AS table, con.contype::TEXT AS type,
+       ARRAY(
+           SELECT a.attname FROM unnest(con.conkey) WITH ORDINALITY AS k(num, pos)
+           JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.num
+           ORDER BY k.pos
+       ) AS columns,
+       ref.relname AS ref_table,
+       ARRAY(
+           SELECT a.attname FROM unnest(con.confkey) WITH ORDINALITY AS k(num, pos)
+           JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.num
+           ORDER BY k.pos
+       ) AS ref_columns,
+       con.confdeltype::TEXT AS on_delete,
+       con.confupdtype::TEXT AS on_update
+FROM pg_constraint con
+JOIN pg_class c ON c.oid = con.conrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_class ref ON ref.oid = con.confrelid
+WHERE c.relname = ANY($1::TEXT[]) AND n.nspname = current_schema()
+  AND con.contype IN ('p', 'u', 'f')
+"""
+
+INDEXES_SQL = """
+SELECT t.relname AS table, i.relname AS name, x.indisunique AS unique,
+       am.amname AS method, pg_get_indexdef(i.oid) AS definition
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_class t ON t.oid = x.indrelid
+JOIN pg_am am ON am.oid = i.relam
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE t.relname = ANY($1::TEXT[]) AND n.nspname = current_schema()
+  AND NOT EXISTS (SELECT 1 FROM pg_constraint con WHERE con.conindid = x.indexrelid)
+"""
+
+ACTIONS = {
+    "a": "NO ACTION",
+    "r": "RESTRICT",
+    "c": "CASCADE",
+    "n": "SET NULL",
+    "d": "SET DEFAULT",
+}
+
+SIMPLE_TYPES = {
+    "bigint": lambda: types.Integer(big=True),
+    "integer": types.Integer,
+    "smallint": lambda: types.Integer(small=True),
+    "text": types.String,
+    "boolean": types.Boolean,
+    "bytea": types.Binary,
+    "date": types.Date,
+    "timestamp without time zone": types.DateTime,
+    "timestamp with time zone": lambda: types.DateTime(timezone=True),
+    "time without time zone": types.Time,
+    "time with time zone": lambda: types.Time(timezone=True),
+    "real": types.Real,
+    "double precision": types.Float,
+    "numeric": types.Numeric,
+    "interval": types.Interval,
+    "json": types.JSON,
+    "jsonb": types.JSONB,
+}
+
+
+class ReflectedType(types.SQLType):
+    """A type of the database without an equivalent :class:`~postDB.types.SQLType`."""
+
+    def __init__(self, sql: str):
+        self.sql = sql
+
+    def to_sql(self):
+        return self.sql.upper()
+
+
+def parse_type(sql: str, default: Optional[str] = None) -> types.SQLType:
+    """Returns the :class:`~postDB.types.SQLType` of a type as formatted
+    by PostgreSQL's ``format_type``, given the column default to detect serials."""
+    if sql.endswith("[]"):
+        return types.Array(parse_type(sql[:-2]))
+
+    if default is not None and default.startswith("nextval("):
+        serials = {
+            "integer": types.Serial,
+            "bigint": lambda: types.Serial(big=True),
+            "smallint": lambda: types.Serial(small=True),
+        }
+        if sql in serials:
+            return serials[sql]()
+
+    simple = SIMPLE_TYPES.get(sql)
+    if simple is not None:
+        return simple()
+
+    match = re.fullmatch(r"(character varying|character)\((\d+)\)", sql)
+    if match:
+        return types.String(
+            length=int(match.group(2)), fixed=match.group(1) == "character"
+        )
+
+    match = re.fullmatch(r"numeric\((\d+),(\d+)\)", sql)
+    if match:
+        return types.Numeric(precision=int(match.group(1)), scale=int(match.group(2)))
+
+    match = re.fullmatch(r"interval (.+)", sql)
+    if match:
+        return types.Interval(match.group(1))
+
+    return ReflectedType(sql)
+
+
+class ReflectedIndex(NamedTuple):
+    name: str
+    unique: bool
+    method: str
+    definition: str
+
+
+class Table(NamedTuple):
+    """A table as it exists in the database."""
+
+    name: str
+    columns: Dict[str, Column]
+    primary_key: Tuple[str, ...]
+    indexes: Dict[str, ReflectedIndex]
+
+
+async def reflect(model: Type["Model"], tables: Sequence[str]) -> Dict[str, Table]:
+    """Returns the tables named ``tables`` that exist, using the pool of ``model``."""
+    from postDB.instrumentation import run
+
+    pool = model._get_pool()
+    names = list(tables)
+    column_rows = await run(model, pool, "fetch", COLUMNS_SQL, names)
+    constraint_rows = await run(model, pool, "fetch", CONSTRAINTS_SQL, names)
+    index_rows = await run(model, pool, "fetch", INDEXES_SQL, names)
+
+    primary_keys: Dict[str, Tuple[str, ...]] = {}
+    unique = set()
+    references = {}
+    for row in constraint_rows:
+        if row["type"] == "p":
+            primary_keys[row["table"]] = tuple(row["columns"])
+        elif row["type"] == "u" and len(row["columns"]) == 1:
+            unique.add((row["table"], row["columns"][0]))
+        elif row["type"] == "f" and len(row["columns"]) == 1:
+            references[row["table"], row["columns"][0]] = row
+
+    found: Dict[str, Table] = {}
+    for row in column_rows:
+        table = found.get(row["table"])
+        if table is None:
+            table = found[row["table"]] = Table(
+                row["table"], {}, primary_keys.get(row["table"], ()), {}
+            )
+
+        name = row["name"]
+        column_type = parse_type(row["type"], row["default"])
+
+        ref = references.get((table.name, name))
+        if ref is not None:
+            column_type = types.ForeignKey(
+                ref["ref_table"],
+                ref["ref_columns"][0],
+                sql_type=column_type,
+                on_delete=ACTIONS[ref["on_delete"]],
+                on_update=ACTIONS[ref["on_update"]],
+            )
+
+        primary_key = name in table.primary_key
+        table.columns[name] = Column(
+            column_type,
+            name=name,
+            nullable=not row["not_null"],
+            primary_key=primary_key,
+            unique=not primary_key and (table.name, name) in unique,
+        )
+
+    for row in index_rows:
+        table = found.get(row["table"])
+        if table is not None:
+            table.indexes[row["name"]] = ReflectedIndex(
+                row["name"], row["unique"], row["method"], row["definition"]
+            )
+
+    return found
+
+
+def describe(column: Column) -> str:
+    """Returns the definition of ``column`` without its name."""
+    return column.generate_create_table_sql().partition(" ")[2]
+
+
+class SchemaDiff:
+    """The differences between a model and its table in the database.
+
+    Only additive changes are applied by :meth:`Model.sync_schema`,
+    see :meth:`statements`. Dropped columns, changed columns, a changed
+    primary key and changed or undeclared indexes are only reported
+    by :meth:`unapplied`, since applying them can lose data or lock the table."""
+
+    def __init__(self, model: Type["Model"], table: Optional[Table]):
+        self.model = model
+        self.table = table
+
+        #: Declared columns missing from the table.
+        self.added: List[Column] = []
+        #: Columns of the table that aren't declared.
+        self.dropped: List[str] = []
+        #: The declared and the live column, for columns that differ.
+        self.changed: List[Tuple[Column, Column]] = []
+        #: Declared indexes missing from the table.
+        self.missing_indexes: List[Index] = []
+        #: The declared and the live index, for indexes that differ.
+        self.changed_indexes: List[Tuple[Index, ReflectedIndex]] = []
+        #: Indexes of the table that aren't declared.
+        self.extra_indexes: List[str] = []
+        self.primary_key_changed = False
+
+        if table is None:
+            return
+
+        schema = model.schema
+        for col in schema.columns:
+            live = table.columns.get(col.name)
+            if live is None:
+                self.added.append(col)
+            elif (
+                col.column_type != live.column_type
+                or col.nullable != live.nullable
+                or col.unique != live.unique
+            ):
+                self.changed.append((col, live))
+
+        self.dropped = [name for name in table.columns if name not in schema.by_name]
+        self.primary_key_changed = schema.primary_key != table.primary_key
+
+        for index in schema.indexes:
+            live = table.indexes.get(index.name)
+            if live is None:
+                self.missing_indexes.append(index)
+            elif live.unique != index.unique or live.method != index.method:
+                self.changed_indexes.append((index, live))
+
+        declared = {index.name for index in schema.indexes}
+        self.extra_indexes = [name for name in table.indexes if name not in declared]
+
+    def __bool__(self) -> bool:
+        return self.table is None or bool(
+            self.added
+            or self.dropped
+            or self.changed
+            or self.missing_indexes
+            or self.changed_indexes
+            or self.extra_indexes
+            or self.primary_key_changed
+        )
+
+    def __repr__(self) -> str:
+        return "<SchemaDiff %s | %s>" % (
+            self.model.__tablename__,
+            "missing" if self.table is None else "%d changes" % self.count(),
+        )
+
+    def count(self) -> int:
+        return (
+            len(self.added)
+            + len(self.dropped)
+            + len(self.changed)
+            + len(self.missing_indexes)
+            + len(self.changed_indexes)
+            + len(self.extra_indexes)
+            + self.primary_key_changed
+        )
+
+    def table_statements(self) -> List[str]:
+        """Returns the statements creating the table or adding the missing columns."""
+        model = self.model
+        if self.table is None:
+            return [model.create_table_sql(exists_ok=True, indexes=False)]
+
+        return [
+            "ALTER TABLE %s ADD COLUMN IF NOT EXISTS %s;"
+            % (model.__tablename__, col.generate_create_table_sql())
+            for col in self.added
+        ]
+
+    def index_statements(self) -> List[str]:
+        """Returns the statements creating the missing indexes."""
+        indexes = self.model.indexes if self.table is None else self.missing_indexes
+        return [index.generate_create_table_sql(exists_ok=True) for index in indexes]
+
+    def statements(self) -> List[str]:
+        """Returns the DDL applying the additive changes."""
+        return self.table_statements() + self.index_statements()
+
+    def unapplied(self) -> List[str]:
+        """Returns a description of every difference :meth:`statements` doesn't apply."""
+        table = self.model.__tablename__
+        notes = [
+            "%s.%s is not declared on %s." % (table, name, self.model.__name__)
+            for name in self.dropped
+        ]
+        notes.extend(
+            "%s.%s is %s, declared as %s."
+            % (table, col.name, describe(live), describe(col))
+            for col, live in self.changed
+        )
+        if self.primary_key_changed:
+            notes.append(
+                "The primary key of %s is (%s), declared as (%s)."
+                % (
+                    table,
+                    ", ".join(self.table.primary_key),
+                    ", ".join(self.model.schema.primary_key),
+                )
+            )
+        notes.extend(
+            "Index %s differs from its declaration: %s" % (index.name, live.definition)
+            for index, live in self.changed_indexes
+        )
+        notes.extend(
+            "Index %s on %s is not declared." % (name, table)
+            for name in self.extra_indexes
+        )
+        return notes
+
+
+def fingerprint(model: Type["Model"]) -> str:
+    """Returns a hash of the declared schema of ``model``."""
+    sql = model.create_table_sql(exists_ok=False, concurrently=False)
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+async def stored_fingerprints(
+    model: Type["Model"], tables: Sequence[str]
+) -> Dict[str, str]:
+    """Returns the fingerprints stored for ``tables``, in a single query."""
+    from asyncpg.exceptions import UndefinedTableError
+    from postDB.instrumentation import run
+
+    sql = "SELECT tablename, fingerprint FROM %s WHERE tablename = ANY($1::TEXT[])"
+    try:
+        rows = await run(
+            model, model._get_pool(), "fetch", sql % FINGERPRINT_TABLE, list(tables)
+        )
+    except UndefinedTableError:
+        return {}
+
+    return {row["tablename"]: row["fingerprint"] for row in rows}
+
+
+async def store_fingerprints(
+    model: Type["Model"], fingerprints: Dict[str, str]
+) -> None:
+    from postDB.instrumentation import run
+
+    pool = model._get_pool()
+    await run(
+        model,
+        pool,
+        "execute",
+        "CREATE TABLE IF NOT EXISTS %s (\n"
+        "    tablename TEXT NOT NULL,\n"
+        "    fingerprint TEXT NOT NULL,\n"
+        "    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),\n"
+        "    PRIMARY KEY (tablename)\n"
+        ");" % FINGERPRINT_TABLE,
+    )
+    await run(
+        model,
+        pool,
+        "execute",
+        "INSERT INTO %s (tablename, fingerprint) "
+        "SELECT * FROM unnest($1::TEXT[], $2::TEXT[]) "
+        "ON CONFLICT (tablename) DO UPDATE "
+        "SET fingerprint = EXCLUDED.fingerprint, updated_at = now()"
+        % FINGERPRINT_TABLE,
+        list(fingerprints),
+        list(fingerprints.values()),
+    )
+
+
+def check_models(models: Sequence[Type["Model"]]) -> None:
+    for model in models:
+        if model.shard_key is not None:
+            raise SchemaError(
+                "Cannot introspect the sharded model %s, use create_table."
+                % model.__name__
+            )
+
+
+async def diff_schema(
+    model: Type["Model"], models: Sequence[Type["Model"]]
+) -> List[SchemaDiff]:
+    check_models(models)
+    tables = await reflect(model, [m.__tablename__ for m in models])
+    return [SchemaDiff(m, tables.get(m.__tablename__)) for m in models]
+
+
+async def sync_schema(
+    model: Type["Model"], models: Sequence[Type["Model"]], *, verbose: bool = False
+) -> List[SchemaDiff]:
+    check_models(models)
+
+    fingerprints = {m.__tablename__: fingerprint(m) for m in models}
+    stored = await stored_fingerprints(model, fingerprints)
+
+    stale = [
+        m
+        for m in models
+        if stored.get(m.__tablename__) != fingerprints[m.__tablename__]
+    ]
+    if not stale:
+        return []
+
+    diffs = [diff for diff in await diff_schema(model, stale) if diff]
+    by_model = {diff.model: diff for diff in diffs}
+    layers = model._dependency_layers(stale)
+
+    for layer in layers:
+        await model._ddl_gather(
+            m._run_ddl(by_model[m].table_statements(), verbose=verbose)
+            for m in layer
+            if m in by_model and by_model[m].table_statements()
+        )
+
+    await model._ddl_gather(
+        diff.model._run_ddl(diff.index_statements(), verbose=verbose)
+        for diff in diffs
+        if diff.index_statements()
+    )
+
+    # A table created above has no time partitions yet and would reject inserts.
+    await model._ddl_gather(
+        m.maintain_partitions(expire=False, verbose=verbose)
+        for m in stale
+        if m._time_partitioned()
+    )
+
+    synced = {}
+    for m in stale:
+        diff = by_model.get(m)
+        notes = diff.unapplied() if diff is not None else []
+        for note in notes:
+            log.warning(note)
+        if not notes:
+            synced[m.__tablename__] = fingerprints[m.__tablename__]
+
+    if synced:
+        await store_fingerprints(model, synced)
+
+    return diffs
@@ -1,10 +1,155 @@
 from postDB import Column
+from postDB.exceptions import SchemaError
+from postDB.model.index import Index
+from postDB.model.partition import Partitioning
+from postDB.types import Serial
 
-from typing import List
+from types import MappingProxyType
+from typing import Any, Callable, FrozenSet, List, Mapping, NamedTuple, Optional, Tuple
+import keyword
+
+#: Class attributes of :class:`Model` which columns can't be named after.
+RESERVED_NAMES = frozenset(
+    ("schema", "indexes", "cache", "shard_key", "partitioning", "replicas", "shards")
+)
+
+
+def format_missing(missing):
+    def fmt_single(name) -> str:
+        return "'%s'" % name
+
+    if len(missing) == 1:
+        return fmt_single(missing[0].name)
+
+    if len(missing) == 2:
+        return " and ".join(fmt_single(col.name) for col in missing)
+
+    return ", ".join(
+        fmt_single(col.name) for col in missing[:-1]
+    ) + " and %s" % fmt_single(missing[-1].name)
+
+
+class Schema(NamedTuple):
+    """Metadata of a model, computed once by :class:`ModelMeta`
+    and available as ``Model.schema``."""
+
+    #: The columns, in the order they were defined.
+    columns: Tuple[Column, ...]
+    #: The names of the columns, in the order they were defined.
+    names: Tuple[str, ...]
+    #: The columns by name.
+    by_name: Mapping[str, Column]
+    #: The names of the primary key columns.
+    primary_key: Tuple[str, ...]
+    #: The names of the columns ``__init__`` requires.
+    required: FrozenSet[str]
+    #: The default of every column that isn't required.
+    defaults: Mapping[str, Any]
+    #: The column and model level indexes.
+    indexes: Tuple[Index, ...]
+
+    @classmethod
+    def build(cls, columns: List[Column], indexes: List[Index]) -> "Schema":
+        required = frozenset(
+            col.name
+            for col in columns
+            if col.default is None
+            and not col.nullable
+            and not isinstance(col.column_type, Serial)
+        )
+
+        return cls(
+            columns=tuple(columns),
+            names=tuple(col.name for col in columns),
+            by_name=MappingProxyType({col.name: col for col in columns}),
+            primary_key=tuple(col.name for col in columns if col.primary_key),
+            required=required,
+            defaults=MappingProxyType(
+                {col.name: col.default for col in columns if col.name not in required}
+            ),
+            indexes=tuple(indexes),
+        )
+
+
+def build_init(name: str, schema: Schema) -> Callable[..., None]:
+    """Compiles an ``__init__`` specialised for the columns of ``schema``.
+
+    The required columns and defaults are resolved once here
+    instead of on every instantiation."""
+    required = [col for col in schema.columns if col.name in schema.required]
+
+    def raise_missing(attrs: dict):
+        missing = [col for col in required if col.name not in attrs]
+        raise TypeError(
+            "__init__() missing {0} required positional arguments: {1}".format(
+                len(missing), format_missing(missing)
+            )
+        )
+
+    namespace = {
+        "_required": schema.required,
+        "_raise_missing": raise_missing,
+        "_setattr": setattr,
+    }
+    lines = ["def __init__(self, **attrs):"]
+
+    if required:
+        lines.append("    if not attrs.keys() >= _required:")
+        lines.append("        _raise_missing(attrs)")
+
+    for i, col in enumerate(schema.columns):
+        if col.name in schema.required:
+            value = "attrs[%r]" % col.name
+        else:
+            namespace["_default_%d" % i] = schema.defaults[col.name]
+            value = "attrs.get(%r, _default_%d)" % (col.name, i)
+
+        if col.name.isidentifier() and not keyword.iskeyword(col.name):
+            lines.append("    self.%s = %s" % (col.name, value))
+        else:
+            lines.append("    _setattr(self, %r, %s)" % (col.name, value))
+
+    if not schema.columns:
+        lines.append("    pass")
+
+    exec("\n".join(lines), namespace)
+
+    init = namespace["__init__"]
+    init.__qualname__ = "%s.__init__" % name
+    return init
+
+
+def build_hydrator(keys: tuple, columns: List[Column]) -> Callable[..., None]:
+    """Compiles a function copying the values of a record with ``keys``
+    onto an instance, by position and without any validation.
+
+    The record is kept as the snapshot used for dirty tracking."""
+    namespace = {"_setattr": setattr}
+    lines = ["def hydrate(self, record):", "    self._Model__snapshot = record"]
+
+    positions = {key: i for i, key in enumerate(keys)}
+    for col in columns:
+        position = positions.get(col.name)
+        if position is None:
+            continue
+
+        if col.name.isidentifier() and not keyword.iskeyword(col.name):
+            lines.append("    self.%s = record[%d]" % (col.name, position))
+        else:
+            lines.append("    _setattr(self, %r, record[%d])" % (col.name, position))
+
+    exec("\n".join(lines), namespace)
+    return namespace["hydrate"]
 
 
 class ModelMeta(type):
-    """Metaclass for Model class."""
+    """Metaclass for Model class.
+
+    Accepts the ``tablename``, ``slots``, ``cache``, ``shard_key`` and
+    ``partition_by`` class keywords.
+    With ``slots=True`` the columns are stored in ``__slots__``, instances
+    then have no ``__dict__`` and the :class:`Column` objects are only
+    available through :attr:`Model.columns`."""
 
     def __new__(mcs, name, parents, data, **kwargs):
 
@@ -13,16 +158,78 @@ class ModelMeta(type):
             return super().__new__(mcs, name, parents, data)
 
         tablename = kwargs.get("tablename", name.lower() + "s")
+        slots = kwargs.get("slots", False)
 
         columns: List[Column] = []
-        for key, col in data.items():
+        indexes: List[Index] = []
+        reserved = set()
+        for key, col in list(data.items()):
             if isinstance(col, Column):
                 if col.name is None:
                     col.name = key
 
                 columns.append(col)
+                reserved.update(RESERVED_NAMES.intersection((key, col.name)))
+
+                if slots:
+                    del data[key]
+
+            elif isinstance(col, Index):
+                indexes.append(col)
 
+        names = {col.name for col in columns}
+
+        if reserved:
+            raise SchemaError(
+                "%s can't have a column named %s, it is used by the Model class."
+                % (name, ", ".join(sorted(reserved)))
+            )
+
+        shard_key = kwargs.get("shard_key")
+        if shard_key is not None:
+            if shard_key not in names:
+                raise SchemaError("Unknown shard key %s on %s." % (shard_key, name))
+
+            col = next(col for col in columns if col.name == shard_key)
+            if isinstance(col.column_type, Serial):
+                raise SchemaError(
+                    "The shard key of %s can't be a Serial column, "
+                    "its value must be known before inserting." % name
+                )
+        for index in indexes:
+            if not index.columns:
+                raise SchemaError(
+                    "Index on %s has no columns, pass them to Index() "
+                    "or pass the index to a Column." % name
+                )
+
+        indexes = [col.index for col in columns if col.index] + indexes
+        for index in indexes:
+            for entry in index.columns + index.include:
+                if not Index.is_expression(entry) and entry not in names:
+                    raise SchemaError(
+                        "Index on %s references unknown column %s." % (name, entry)
+                    )
+        schema = Schema.build(columns, indexes)
+
+        partitioning: Optional[Partitioning] = kwargs.get("partition_by")
+        if partitioning is not None:
+            partitioning.validate(name, columns, schema.primary_key, indexes)
+
+        if slots and "__slots__" not in data:
+            data["__slots__"] = schema.names
+
+        if "__init__" not in data:
+            data["__init__"] = build_init(name, schema)
+
+        data["schema"] = schema
         data["columns"] = columns
+        data["indexes"] = indexes
+        data["_hydrators"] = {}
+        data["_query_cache"] = {}
+        data["cache"] = kwargs.get("cache")
+        data["shard_key"] = shard_key
+        data["partitioning"] = partitioning
         data["__tablename__"] = tablename
 
         model = super().__new__(mcs, name, parents, data)
@@ -30,6 +237,14 @@ class ModelMeta(type):
         for col in columns:
             col.model = model
 
+        for index in indexes:
+            index.model = model
+            if index.name is None:
+                index.name = index.default_name()
+
+        if partitioning is not None:
+            partitioning.model = model
+
         return model
 
     @property
@@ -0,0 +1,603 @@
+from typing import (
+    Any,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Type,
+    TYPE_CHECKING,
+)
+import re
+
+from postDB.exceptions import SchemaError
+from postDB.types import SQLType, ForeignKey, Serial
+
+if TYPE_CHECKING:
+    from asyncpg.pool import Pool
+    from postDB.model.model import Model
+
+
+#: Version of the format of :func:`serialize_schema`.
+SCHEMA_VERSION = 1
+
+
+def serialize_schema(models: Iterable[Type["Model"]]) -> dict:
+    """Returns the declared schema of ``models`` as a JSON serializable dict,
+    the types are serialized with :meth:`SQLType.to_dict`."""
+    tables = {}
+    for model in models:
+        tables[model.__tablename__] = {
+            "create": model.create_table_sql(exists_ok=True, indexes=False),
+            "primary_key": list(model.schema.primary_key),
+            "columns": [
+                {
+                    "name": col.name,
+                    "type": col.column_type.to_dict(),
+                    "nullable": col.nullable,
+                    "unique": col.unique,
+                    "default": col.default_sql(),
+                }
+                for col in model.columns
+            ],
+            "indexes": [
+                {
+                    "name": index.name,
+                    "sql": index.generate_create_table_sql(
+                        exists_ok=True, concurrently=True
+                    ),
+                }
+                for index in model.indexes
+            ],
+        }
+
+    return {"version": SCHEMA_VERSION, "tables": tables}
+
+
+class Step(NamedTuple):
+    """A statement of a :class:`MigrationPlan`."""
+
+    sql: str
+    description: str
+    #: ``False`` for statements which can't run in a transaction, like ``CONCURRENTLY``.
+    transactional: bool = True
+    #: The statement rewrites the table while holding an ``ACCESS EXCLUSIVE`` lock.
+    rewrite: bool = False
+    #: The statement drops data.
+    destructive: bool = False
+    #: For backfills, the statement is repeated until it updates fewer rows than this.
+    batch: Optional[int] = None
+    #: Run before retrying the statement, like dropping an invalid index.
+    cleanup: Optional[str] = None
+
+
+def _load_type(data: dict) -> SQLType:
+    # from_dict consumes the "__meta__" key, keep the schema intact.
+    return SQLType.from_dict(dict(data))
+
+
+def _reference(column_type: SQLType) -> Optional[tuple]:
+    if not isinstance(column_type, ForeignKey):
+        return None
+    return (
+        column_type.model,
+        column_type.column,
+        column_type.on_delete,
+        column_type.on_update,
+    )
+
+
+def _coercible(old: str, new: str) -> bool:
+    """Returns a bool stating if a column of type ``old`` can be changed
+    to ``new`` without rewriting the table."""
+    if new == "TEXT" and re.fullmatch(r"(VARCHAR\(\d+\)|TEXT)", old):
+        return True
+
+    varchar = re.fullmatch(r"VARCHAR\((\d+)\)", old), re.fullmatch(
+        r"VARCHAR\((\d+)\)", new
+    )
+    if all(varchar):
+        return int(varchar[1].group(1)) >= int(varchar[0].group(1))
+
+    numeric = re.fullmatch(r"NUMERIC\((\d+), (\d+)\)", old)
+    if numeric and new == "NUMERIC":
+        return True
+
+    widened = re.fullmatch(r"NUMERIC\((\d+), (\d+)\)", new)
+    if numeric and widened:
+        return widened.group(2) == numeric.group(2) and int(widened.group(1)) >= int(
+            numeric.group(1)
+        )
+
+    return False
+
+
+def _table_order(tables: Mapping[str, dict]) -> List[str]:
+    """Returns the names of ``tables``, the referenced ones first."""
+    dependencies = {}
+    for name, table in tables.items():
+        references = (_reference(_load_type(col["type"])) for col in table["columns"])
+        dependencies[name] = {
+            ref[0] for ref in references if ref and ref[0] in tables and ref[0] != name
+        }
+
+    order = []
+    while dependencies:
+        layer = sorted(name for name, needs in dependencies.items() if not needs)
+        if not layer:
+            raise SchemaError(
+                "Circular ForeignKey references between %s." % ", ".join(dependencies)
+            )
+        for name in layer:
+            del dependencies[name]
+        for needs in dependencies.values():
+            needs.difference_update(layer)
+        order.extend(layer)
+
+    return order
+
+
+class _Planner:
+    def __init__(self, backfills: Mapping[str, str], batch_size: int):
+        self.backfills = backfills
+        self.batch_size = batch_size
+
+        # Steps are grouped so cheap metadata changes come first,
+        # then backfills, constraint validation, indexes and finally drops.
+        self.alter: List[Step] = []
+        self.backfill: List[Step] = []
+        self.constrain: List[Step] = []
+        self.index: List[Step] = []
+        self.drop: List[Step] = []
+
+    def steps(self) -> List[Step]:
+        return self.alter + self.backfill + self.constrain + self.index + self.drop
+
+    def create_index(self, table: str, name: str, sql: str, unique_constraint=False):
+        self.index.append(
+            Step(
+                sql,
+                "Create index %s on %s without blocking writes" % (name, table),
+                transactional=False,
+                cleanup="DROP INDEX CONCURRENTLY IF EXISTS %s;" % name,
+            )
+        )
+        if unique_constraint:
+            self.index.append(
+                Step(
+                    "ALTER TABLE %s ADD CONSTRAINT %s UNIQUE USING INDEX %s;"
+                    % (table, name, name),
+                    "Turn index %s into a unique constraint" % name,
+                )
+            )
+
+    def drop_index(self, table: str, name: str):
+        self.drop.append(
+            Step(
+                "DROP INDEX CONCURRENTLY IF EXISTS %s;" % name,
+                "Drop index %s on %s without blocking writes" % (name, table),
+                transactional=False,
+            )
+        )
+
+    def add_reference(self, table: str, column: str, column_type: ForeignKey):
+        name = "%s_%s_fkey" % (table, column)
+        self.constrain.append(
+            Step(
+                "ALTER TABLE %s ADD CONSTRAINT %s FOREIGN KEY (%s) REFERENCES %s(%s)"
+                " ON DELETE %s ON UPDATE %s NOT VALID;"
+                % (
+                    table,
+                    name,
+                    column,
+                    column_type.model,
+                    column_type.column,
+                    column_type.on_delete,
+                    column_type.on_update,
+                ),
+                "Add foreign key %s without checking the existing rows" % name,
+            )
+        )
+        self.constrain.append(
+            Step(
+                "ALTER TABLE %s VALIDATE CONSTRAINT %s;" % (table, name),
+                "Check the existing rows against %s without blocking writes" % name,
+            )
+        )
+
+    def add_unique(self, table: str, column: str):
+        name = "%s_%s_key" % (table, column)
+        self.create_index(
+            table,
+            name,
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS %s ON %s (%s);"
+            % (name, table, column),
+            unique_constraint=True,
+        )
+
+    def set_not_null(self, table: str, column: str):
+        key = "%s.%s" % (table, column)
+        expression = self.backfills.get(key)
+        if expression is not None:
+            self.backfill.append(
+                Step(
+                    "UPDATE {table} SET {column} = {value} WHERE ctid IN ("
+                    "SELECT ctid FROM {table} WHERE {column} IS NULL "
+                    "AND ({value}) IS NOT NULL LIMIT {batch});".format(
+                        table=table,
+                        column=column,
+                        value=expression,
+                        batch=self.batch_size,
+                    ),
+                    "Backfill %s in batches of %d rows" % (key, self.batch_size),
+                    batch=self.batch_size,
+                )
+            )
+
+        # A validated CHECK lets SET NOT NULL skip scanning the table.
+        name = "%s_%s_not_null" % (table, column)
+        self.constrain.extend(
+            [
+                Step(
+                    "ALTER TABLE %s ADD CONSTRAINT %s CHECK (%s IS NOT NULL) NOT VALID;"
+                    % (table, name, column),
+                    "Add a NOT NULL check of %s without checking the existing rows"
+                    % key,
+                ),
+                Step(
+                    "ALTER TABLE %s VALIDATE CONSTRAINT %s;" % (table, name),
+                    "Check the existing rows of %s without blocking writes" % key,
+                ),
+                Step(
+                    "ALTER TABLE %s ALTER COLUMN %s SET NOT NULL;" % (table, column),
+                    "Set %s NOT NULL using the validated check" % key,
+                ),
+                Step(
+                    "ALTER TABLE %s DROP CONSTRAINT %s;" % (table, name),
+                    "Drop the NOT NULL check of %s" % key,
+                ),
+            ]
+        )
+
+    def create_table(self, name: str, table: dict):
+        self.alter.append(Step(table["create"], "Create table %s" % name))
+        for index in table["indexes"]:
+            self.create_index(name, index["name"], index["sql"])
+
+    def add_column(self, table: str, column: dict):
+        name = column["name"]
+        column_type = _load_type(column["type"])
+        key = "%s.%s" % (table, name)
+
+        serial = isinstance(column_type, Serial)
+        builder = [
+            "ALTER TABLE %s ADD COLUMN IF NOT EXISTS %s" % (table, name),
+            column_type.to_sql() if serial else column_type.to_base_sql(),
+        ]
+
+        # Constant defaults are stored in the catalog, without rewriting the table.
+        default = column["default"]
+        if default is not None:
+            builder.append("DEFAULT %s" % default)
+            if not column["nullable"]:
+                builder.append("NOT NULL")
+
+        self.alter.append(
+            Step(
+                " ".join(builder) + ";",
+                "Add column %s" % key,
+                rewrite=serial,
+            )
+        )
+
+        if not column["nullable"] and default is None and not serial:
+            if key not in self.backfills:
+                raise SchemaError(
+                    "%s is NOT NULL without a default, pass a backfill expression for it."
+                    % key
+                )
+            self.set_not_null(table, name)
+
+        if isinstance(column_type, ForeignKey):
+            self.add_reference(table, name, column_type)
+
+        if column["unique"]:
+            self.add_unique(table, name)
+
+    def change_column(self, table: str, old: dict, new: dict):
+        name = new["name"]
+        key = "%s.%s" % (table, name)
+        old_type, new_type = _load_type(old["type"]), _load_type(new["type"])
+
+        old_sql, new_sql = old_type.to_base_sql(), new_type.to_base_sql()
+        if old_sql != new_sql:
+            coercible = _coercible(old_sql, new_sql)
+            self.alter.append(
+                Step(
+                    "ALTER TABLE %s ALTER COLUMN %s TYPE %s%s;"
+                    % (
+                        table,
+                        name,
+                        new_sql,
+                        "" if coercible else " USING %s::%s" % (name, new_sql),
+                    ),
+                    "Change the type of %s from %s to %s" % (key, old_sql, new_sql),
+                    rewrite=not coercible,
+                )
+            )
+
+        if _reference(old_type) != _reference(new_type):
+            if isinstance(old_type, ForeignKey):
+                self.alter.append(
+                    Step(
+                        "ALTER TABLE %s DROP CONSTRAINT IF EXISTS %s_%s_fkey;"
+                        % (table, table, name),
+                        "Drop the foreign key of %s" % key,
+                    )
+                )
+            if isinstance(new_type, ForeignKey):
+                self.add_reference(table, name, new_type)
+
+        if old["default"] != new["default"]:
+            if new["default"] is None:
+                sql = "ALTER TABLE %s ALTER COLUMN %s DROP DEFAULT;" % (table, name)
+            else:
+                sql = "ALTER TABLE %s ALTER COLUMN %s SET DEFAULT %s;" % (
+                    table,
+                    name,
+                    new["default"],
+                )
+            self.alter.append(Step(sql, "Change the default of %s" % key))
+
+        if old["nullable"] and not new["nullable"]:
+            self.set_not_null(table, name)
+        elif not old["nullable"] and new["nullable"]:
+            self.alter.append(
+                Step(
+                    "ALTER TABLE %s ALTER COLUMN %s DROP NOT NULL;" % (table, name),
+                    "Make %s nullable" % key,
+                )
+            )
+
+        if new["unique"] and not old["unique"]:
+            self.add_unique(table, name)
+        elif old["unique"] and not new["unique"]:
+            self.alter.append(
+                Step(
+                    "ALTER TABLE %s DROP CONSTRAINT IF EXISTS %s_%s_key;"
+                    % (table, table, name),
+                    "Drop the unique constraint of %s" % key,
+                )
+            )
+
+    def change_primary_key(self, table: str, columns: Sequence[str]):
+        if not columns:
+            self.alter.append(
+                Step(
+                    "ALTER TABLE %s DROP CONSTRAINT IF EXISTS %s_pkey;"
+                    % (table, table),
+                    "Drop the primary key of %s" % table,
+                )
+            )
+            return
+
+        index = "%s_pkey_new" % table
+        self.create_index(
+            table,
+            index,
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS %s ON %s (%s);"
+            % (index, table, ", ".join(columns)),
+        )
+        self.index.append(
+            Step(
+                "ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_pkey, "
+                "ADD CONSTRAINT {table}_pkey PRIMARY KEY USING INDEX {index};".format(
+                    table=table, index=index
+                ),
+                "Swap the primary key of %s to (%s)" % (table, ", ".join(columns)),
+            )
+        )
+
+    def change_table(self, name: str, old: dict, new: dict):
+        old_columns = {col["name"]: col for col in old["columns"]}
+        new_columns = {col["name"]: col for col in new["columns"]}
+
+        for column in new["columns"]:
+            previous = old_columns.get(column["name"])
+            if previous is None:
+                self.add_column(name, column)
+            elif previous != column:
+                self.change_column(name, previous, column)
+
+        if old["primary_key"] != new["primary_key"]:
+            self.change_primary_key(name, new["primary_key"])
+
+        old_indexes = {index["name"]: index for index in old["indexes"]}
+        new_indexes = {index["name"]: index for index in new["indexes"]}
+        for index_name, index in new_indexes.items():
+            previous = old_indexes.get(index_name)
+            if previous == index:
+                continue
+            if previous is not None:
+                # Build the new definition under a temporary name, then swap.
+                temporary = index_name + "_new"
+                self.create_index(
+                    name,
+                    temporary,
+                    index["sql"].replace(
+                        " %s ON " % index_name, " %s ON " % temporary, 1
+                    ),
+                )
+                self.drop_index(name, index_name)
+                self.drop.append(
+                    Step(
+                        "ALTER INDEX %s RENAME TO %s;" % (temporary, index_name),
+                        "Rename index %s to %s" % (temporary, index_name),
+                    )
+                )
+            else:
+                self.create_index(name, index_name, index["sql"])
+
+        for index_name in old_indexes:
+            if index_name not in new_indexes:
+                self.drop_index(name, index_name)
+
+        for column_name in old_columns:
+            if column_name not in new_columns:
+                self.drop.append(
+                    Step(
+                        "ALTER TABLE %s DROP COLUMN IF EXISTS %s;"
+                        % (name, column_name),
+                        "Drop column %s.%s" % (name, column_name),
+                        destructive=True,
+                    )
+                )
+
+
+class MigrationPlan:
+    """Ordered :class:`Step` objects migrating a database from one schema to another,
+    created by :func:`plan_migration`.
+
+    The plan avoids long ``ACCESS EXCLUSIVE`` locks: columns are added without
+    rewrites, indexes are created ``CONCURRENTLY``, foreign keys and ``NOT NULL``
+    are added as ``NOT VALID`` constraints validated afterwards, and backfills
+    run in batches. Steps flagged :attr:`Step.rewrite` or :attr:`Step.destructive`
+    are only applied when explicitly allowed."""
+
+    def __init__(self, steps: List[Step]):
+        self.steps = steps
+
+    def __bool__(self) -> bool:
+        return bool(self.steps)
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __repr__(self) -> str:
+        return "<MigrationPlan %d steps>" % len(self.steps)
+
+    def to_sql(self) -> str:
+        """Returns the plan as a commented SQL script, for review."""
+        blocks = []
+        for step in self.steps:
+            notes = [step.description]
+            if not step.transactional:
+                notes.append("can't run in a transaction")
+            if step.batch is not None:
+                notes.append("repeat until fewer than %d rows are updated" % step.batch)
+            if step.rewrite:
+                notes.append("REWRITES THE TABLE")
+            if step.destructive:
+                notes.append("DROPS DATA")
+            blocks.append("-- %s\n%s" % (", ".join(notes), step.sql))
+
+        return "\n\n".join(blocks)
+
+    async def apply(
+        self,
+        pool: Optional["Pool"] = None,
+        *,
+        lock_timeout: float = 2.0,
+        retries: int = 5,
+        throttle: float = 0.1,
+        allow_rewrite: bool = False,
+        allow_destructive: bool = False,
+        verbose: bool = False,
+    ) -> None:
+        """Run the plan on a single connection of ``pool``, by default the pool of :class:`Model`.
+
+        Every statement runs with ``lock_timeout`` (in seconds), so a statement
+        waiting for a lock doesn't queue the other queries of the table behind it.
+        Statements that time out are retried ``retries`` times with an
+        exponential backoff. Backfill batches are spaced by ``throttle`` seconds."""
+        import asyncio
+        from asyncpg.exceptions import LockNotAvailableError
+        from postDB.instrumentation import run
+        from postDB.model.model import Model
+
+        for step in self.steps:
+            if step.rewrite and not allow_rewrite:
+                raise SchemaError(
+                    "%s rewrites the table, pass allow_rewrite=True to apply it."
+                    % step.description
+                )
+            if step.destructive and not allow_destructive:
+                raise SchemaError(
+                    "%s drops data, pass allow_destructive=True to apply it."
+                    % step.description
+                )
+
+        if pool is None:
+            pool = Model._primary_pool()
+
+        async def execute(con, step: Step) -> str:
+            for attempt in range(retries + 1):
+                try:
+                    return await run(Model, con, "execute", step.sql)
+                except LockNotAvailableError:
+                    if attempt == retries:
+                        raise
+                    if step.cleanup is not None:
+                        await run(Model, con, "execute", step.cleanup)
+                    await asyncio.sleep(0.5 * 2**attempt)
+
+        async with pool.acquire() as con:
+            await con.execute("SET lock_timeout = %d" % (lock_timeout * 1000))
+            try:
+                for step in self.steps:
+                    if verbose:
+                        print(step.sql)
+
+                    if step.batch is None:
+                        await execute(con, step)
+                        continue
+
+                    while True:
+                        status = await execute(con, step)
+                        if int(status.rpartition(" ")[2]) < step.batch:
+                            break
+                        await asyncio.sleep(throttle)
+            finally:
+                await con.execute("RESET lock_timeout")
+
+
+def plan_migration(
+    old: Mapping[str, Any],
+    new: Mapping[str, Any],
+    *,
+    backfills: Optional[Mapping[str, str]] = None,
+    batch_size: int = 1000,
+) -> MigrationPlan:
+    """Returns the :class:`MigrationPlan` from the schema ``old`` to ``new``,
+    both from :func:`serialize_schema`.
+
+    ``backfills`` maps ``"table.column"`` to a SQL expression filling the column
+    where it is ``NULL``, required for columns becoming ``NOT NULL`` without a default.
+    It may reference the other columns of the row."""
+    for schema in (old, new):
+        if schema.get("version") != SCHEMA_VERSION:
+            raise SchemaError(
+                "Unsupported schema version %r." % (schema.get("version"),)
+            )
+
+    planner = _Planner(backfills or {}, batch_size)
+    old_tables, new_tables = old["tables"], new["tables"]
+
+    for name in _table_order(new_tables):
+        if name not in old_tables:
+            planner.create_table(name, new_tables[name])
+        else:
+            planner.change_table(name, old_tables[name], new_tables[name])
+
+    for name in reversed(_table_order(old_tables)):
+        if name not in new_tables:
+            planner.drop.append(
+                Step(
+                    "DROP TABLE IF EXISTS %s;" % name,
+                    "Drop table %s" % name,
+                    destructive=True,
+                )
+            )
+
+    return MigrationPlan(planner.steps())
@@ -1,34 +1,80 @@
-import json
-from asyncio import BaseEventLoop
-from typing import Optional, List, Type
+import datetime
+import time
+from contextlib import asynccontextmanager, contextmanager, AsyncExitStack
+from contextvars import ContextVar
+from itertools import islice, count
+from typing import (
+    Literal,
+    Optional,
+    List,
+    Type,
+    Iterable,
+    Iterator,
+    AsyncIterator,
+    Union,
+    Sequence,
+    Callable,
+    Awaitable,
+    TYPE_CHECKING,
+)
 
-from asyncpg import create_pool
-from asyncpg.connection import Connection
-from asyncpg.pool import Pool
+from postDB.exceptions import SchemaError
+from postDB.codecs import JSONCodec
+from postDB.instrumentation import run, acquire, observing, record_statement
+from postDB.model.column import Column
+from postDB.model.meta import ModelMeta, format_missing, build_hydrator
+from postDB.model.query import Query, Page
+from postDB.model.cache import ModelCache, CacheListener
+from postDB.model.shard import shard_index, gather
+from postDB.model import introspection
+from postDB.model.introspection import SchemaDiff
+from postDB.model import partition
+from postDB.model.partition import Partitioning, PartitionMaintenance
+from postDB.types import Serial, Array, ForeignKey
 
-from postDB.model.meta import ModelMeta
-from postDB.types import Serial
+if TYPE_CHECKING:
+    from asyncio import BaseEventLoop
+    from asyncpg import Record
+    from asyncpg.connection import Connection
+    from asyncpg.pool import Pool
 
+_MISSING = object()
 
-def format_missing(missing):
-    def fmt_single(name) -> str:
-        return "'%s'" % name
+# The connection of the current Model.transaction(), if any.
+_connection: ContextVar[Optional["Connection"]] = ContextVar(
+    "postDB_connection", default=None
+)
+# Cache entries to evict again once the current Model.transaction() ends.
+_pending_invalidations: ContextVar[Optional[list]] = ContextVar(
+    "postDB_pending_invalidations", default=None
+)
+# Set by Model.use_primary() to send reads to the primary pool.
+_use_primary: ContextVar[bool] = ContextVar("postDB_use_primary", default=False)
+_replica_counter = count()
 
-    if len(missing) == 1:
-        return fmt_single(missing[0].name)
 
-    if len(missing) == 2:
-        return " and ".join(fmt_single(col.name) for col in missing)
-
-    return ", ".join(
-        fmt_single(col.name) for col in missing[:-1]
-    ) + " and %s" % fmt_single(missing[-1].name)
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """Yield lists of at most ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 class Model(metaclass=ModelMeta):
     """Base class for all the models."""
 
-    pool: Optional[Pool] = None
+    __slots__ = ("__record", "__snapshot", "__forced", "__related")
+
+    pool: Optional["Pool"] = None
+    replicas: List["Pool"] = []
+    replica_strategy: str = "round_robin"
+    shard_key: Optional[str] = None
+    shards: List["Pool"] = []
+    cache: Optional[ModelCache] = None
+    partitioning: Optional[Partitioning] = None
 
     def __init__(self, **attrs):
         missing = []
@@ -56,9 +102,543 @@ class Model(metaclass=ModelMeta):
                 )
             )
 
+    def __getattr__(self, name: str):
+        if name.startswith("_Model__"):
+            raise AttributeError(name)
+
+        try:
+            return self.__related[name]
+        except (AttributeError, KeyError):
+            pass
+
+        try:
+            record = self.__record
+        except AttributeError:
+            raise AttributeError(
+                "%r object has no attribute %r" % (type(self).__name__, name)
+            ) from None
+
+        # Lazily hydrated, copy the values that were not assigned since.
+        del self.__record
+        names = type(self).schema.by_name
+        for key, value in record.items():
+            if key in names:
+                try:
+                    object.__getattribute__(self, key)
+                except AttributeError:
+                    setattr(self, key, value)
+
+        return getattr(self, name)
+
+    @classmethod
+    def _get_hydrator(cls, record) -> Callable[["Model", "Record"], None]:
+        keys = tuple(record.keys())
+        try:
+            return cls._hydrators[keys]
+        except KeyError:
+            hydrate = cls._hydrators[keys] = build_hydrator(keys, cls.columns)
+            return hydrate
+
     @classmethod
-    def create_table_sql(cls, *, exists_ok: bool = True) -> str:
-        """Generates the ``CREATE TABLE`` SQL statement."""
+    def from_record(cls, record: "Record", *, lazy: bool = False) -> "Model":
+        """Create an instance from a :class:`asyncpg.Record`.
+
+        The record is trusted to come from the database, so unlike ``__init__``
+        no validation or defaults are applied. Values are copied by position,
+        columns missing from the record are left unset.
+
+        With ``lazy=True`` the instance keeps a reference to the record
+        and only copies the values once an attribute is first accessed."""
+        self = cls.__new__(cls)
+
+        if lazy:
+            self.__record = self.__snapshot = record
+        else:
+            cls._get_hydrator(record)(self, record)
+
+        return self
+
+    @classmethod
+    def from_records(
+        cls, records: Sequence["Record"], *, lazy: bool = False
+    ) -> List["Model"]:
+        """Create instances from the result of a query,
+        see :meth:`from_record`.
+
+        All records are expected to have the same columns."""
+        if not records:
+            return []
+
+        new = cls.__new__
+        instances = []
+        append = instances.append
+
+        if lazy:
+            for record in records:
+                self = new(cls)
+                self.__record = self.__snapshot = record
+                append(self)
+            return instances
+
+        hydrate = cls._get_hydrator(records[0])
+        for record in records:
+            self = new(cls)
+            hydrate(self, record)
+            append(self)
+
+        return instances
+
+    def dirty_columns(self) -> List[str]:
+        """Returns the names of the columns changed since the instance was loaded
+        from the database or last saved.
+
+        Instances created with ``__init__`` are not known to match a row,
+        so all of their columns are dirty. Changes made in place to mutable
+        values (like a ``dict`` of a JSON column) are not detected,
+        use :meth:`mark_dirty` for those."""
+        try:
+            snapshot = self.__snapshot
+        except AttributeError:
+            return list(type(self).schema.names)
+
+        try:
+            forced = self.__forced
+        except AttributeError:
+            forced = ()
+
+        dirty = []
+        for col in self.columns:
+            name = col.name
+            if name in forced:
+                dirty.append(name)
+                continue
+
+            try:
+                value = getattr(self, name)
+            except AttributeError:
+                continue
+
+            original = snapshot.get(name, _MISSING)
+            if original is _MISSING or original != value:
+                dirty.append(name)
+
+        return dirty
+
+    def mark_dirty(self, *columns: str) -> None:
+        """Flag columns as changed, so they are written by the next :meth:`save`."""
+        names = type(self).schema.by_name
+        for name in columns:
+            if name not in names:
+                raise ValueError(
+                    "%s is not a attribute of the %s Model."
+                    % (name, type(self).__name__)
+                )
+
+        try:
+            self.__forced.update(columns)
+        except AttributeError:
+            self.__forced = set(columns)
+
+    async def save(self) -> Optional[str]:
+        """Write the dirty columns of this instance to its row,
+        with an ``UPDATE`` keyed by the primary key and, if any, the shard key.
+
+        Returns the status of the ``UPDATE``, or ``None`` if nothing changed."""
+        cls = type(self)
+        pks = cls.schema.primary_key
+        if not pks:
+            raise SchemaError("%s has no primary key." % cls.__name__)
+
+        dirty = self.dirty_columns()
+        if not dirty:
+            return None
+
+        try:
+            snapshot = self.__snapshot
+        except AttributeError:
+            snapshot = {}
+
+        # Match the row by the primary key it was loaded with,
+        # in case the primary key itself was changed. The shard key
+        # sends the UPDATE only to the shard owning the row.
+        names = pks
+        if cls.shard_key is not None:
+            previous = snapshot.get(cls.shard_key, _MISSING)
+            if previous is not _MISSING and previous != getattr(
+                self, cls.shard_key, None
+            ):
+                raise SchemaError(
+                    "Cannot change the shard key %s of a saved %s, "
+                    "the row would stay on its old shard."
+                    % (cls.shard_key, cls.__name__)
+                )
+            if cls.shard_key not in pks:
+                names = pks + (cls.shard_key,)
+
+        key = {}
+        for name in names:
+            value = snapshot.get(name, _MISSING)
+            if value is _MISSING:
+                value = getattr(self, name, None)
+            if value is None:
+                raise ValueError(
+                    "Cannot save a %s without a value for %s." % (cls.__name__, name)
+                )
+            key[name] = value
+
+        values = {
+            name: getattr(self, name)
+            for name in dirty
+            if name not in key or key[name] != getattr(self, name)
+        }
+        if not values:
+            return None
+
+        status = await Query(cls).where(**key).update(**values)
+
+        self.__snapshot = {
+            col.name: getattr(self, col.name)
+            for col in cls.columns
+            if hasattr(self, col.name)
+        }
+        self.__forced = set()
+        return status
+
+    async def update(self, **attrs) -> Optional[str]:
+        """Set the given attributes and :meth:`save` the instance."""
+        names = type(self).schema.by_name
+        for name, value in attrs.items():
+            if name not in names:
+                raise ValueError(
+                    "%s is not a attribute of the %s Model."
+                    % (name, type(self).__name__)
+                )
+            setattr(self, name, value)
+
+        return await self.save()
+
+    @classmethod
+    async def prefetch(
+        cls, instances: Sequence["Model"], *columns: str, **named: str
+    ) -> None:
+        """Load the rows referenced by :class:`~postDB.types.ForeignKey` columns
+        of ``instances`` with one query per column, and attach them to the instances.
+
+        Positional column names ending in ``_id`` are attached without the suffix,
+        other names can be given as keywords, ``related_name=column_name``.
+        Rows that don't exist are attached as ``None``.
+
+        .. code-block:: python3
+
+            posts = await Post.where(published=True).fetch()
+            await Post.prefetch(posts, "author_id")
+            print(posts[0].author.username)
+        """
+        for column in columns:
+            if not column.endswith("_id"):
+                raise ValueError(
+                    "Cannot derive a name for %s, pass it as a keyword instead."
+                    % column
+                )
+            named[column[:-3]] = column
+
+        by_name = cls.schema.by_name
+
+        for related_name, column in named.items():
+            col = by_name.get(column)
+            if col is None:
+                raise ValueError(
+                    "%s is not a attribute of the %s Model." % (column, cls.__name__)
+                )
+
+            fk = col.column_type
+            if not isinstance(fk, ForeignKey):
+                raise SchemaError("%s is not a ForeignKey column." % column)
+
+            target = Model._model_for_table(fk.model)
+            values = {getattr(instance, column) for instance in instances}
+            values.discard(None)
+
+            related = await target._get_many(fk.column, values)
+
+            for instance in instances:
+                try:
+                    store = instance.__related
+                except AttributeError:
+                    store = instance.__related = {}
+
+                store[related_name] = related.get(getattr(instance, column))
+
+    @classmethod
+    async def _get_many(cls, column: str, values: Iterable) -> dict:
+        """Returns a dict of value: instance for the rows where ``column`` is in ``values``,
+        using the cache when ``column`` is the primary key."""
+        found = {}
+        missing = list(values)
+
+        cache = cls._shared_cache()
+        pks = cls.schema.primary_key
+        use_cache = cache is not None and pks == (column,)
+
+        if use_cache:
+            missing = []
+            for value in values:
+                instance = cache.get((value,))
+                if instance is None:
+                    missing.append(value)
+                else:
+                    found[value] = instance
+
+        if missing:
+            query = Query(cls).where(**{column + "__in": missing})
+            for instance in await query.fetch():
+                value = getattr(instance, column)
+                found[value] = instance
+                if use_cache:
+                    cache.set((value,), instance)
+
+        return found
+
+    @classmethod
+    def _model_for_table(cls, tablename: str) -> Type["Model"]:
+        for model in cls._walk_models():
+            if model.__tablename__ == tablename:
+                return model
+
+        raise SchemaError("No model found for the table %s." % tablename)
+
+    @classmethod
+    def select(cls, *columns: str) -> Query:
+        """Start a :class:`Query` selecting the given columns (all by default)."""
+        return Query(cls).select(*columns)
+
+    @classmethod
+    def where(cls, **conditions) -> Query:
+        """Start a :class:`Query` with the given conditions, see :meth:`Query.where`."""
+        return Query(cls).where(**conditions)
+
+    @classmethod
+    async def get(cls, *key) -> Optional["Model"]:
+        """Fetch an instance by its primary key values, or ``None`` if it doesn't exist.
+
+        Uses the model's :class:`ModelCache` when one is configured,
+        except inside a :meth:`transaction`."""
+        pks = cls.schema.primary_key
+        if not pks:
+            raise SchemaError("%s has no primary key." % cls.__name__)
+
+        if len(key) != len(pks):
+            raise TypeError(
+                "get() takes %d primary key values (%d given)" % (len(pks), len(key))
+            )
+
+        cache = cls._shared_cache()
+        if cache is not None:
+            instance = cache.get(key)
+            if instance is not None:
+                return instance
+
+        instance = await Query(cls).where(**dict(zip(pks, key))).fetchrow()
+
+        if instance is not None and cache is not None:
+            cache.set(key, instance)
+
+        return instance
+
+    @classmethod
+    def _shared_cache(cls) -> Optional[ModelCache]:
+        # Rows read in a transaction may be uncommitted or rolled back,
+        # they can't be shared with the other callers.
+        if _connection.get() is not None:
+            return None
+        return cls.cache
+
+    @classmethod
+    def invalidate(cls, *key) -> None:
+        """Remove an instance from the model's cache by its primary key values,
+        or clear the whole cache when no key is given."""
+        cls._invalidate([key] if key else None)
+
+    @classmethod
+    def _invalidate(
+        cls,
+        keys: Optional[Iterable[tuple]] = None,
+        cache: Optional[ModelCache] = None,
+    ) -> None:
+        if cache is None:
+            cache = cls.cache
+        if cache is None:
+            return
+
+        # Until the transaction ends other callers still read the old rows
+        # and may cache them again, evict them once more at the end.
+        pending = _pending_invalidations.get()
+        if pending is not None:
+            keys = None if keys is None else list(keys)
+            pending.append((cls, keys))
+
+        if keys is None:
+            cache.clear()
+            return
+
+        for key in keys:
+            cache.invalidate(key)
+
+    @classmethod
+    async def paginate(
+        cls,
+        order_by: Sequence[str] = (),
+        *,
+        after: Optional[str] = None,
+        limit: int = 50,
+        lazy: bool = False,
+    ) -> Page:
+        """Fetch a page of rows using keyset pagination, see :meth:`Query.paginate`.
+
+        .. code-block:: python3
+
+            page = await User.paginate(["-created_at"], limit=20)
+            while page.after is not None:
+                page = await User.paginate(["-created_at"], after=page.after, limit=20)
+        """
+        return await Query(cls).paginate(order_by, after=after, limit=limit, lazy=lazy)
+
+    @classmethod
+    def stream(
+        cls,
+        where: Optional[str] = None,
+        *args,
+        prefetch: int = 1000,
+        batch_size: Optional[int] = None,
+        lazy: bool = False,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[Union["Model", List["Model"]]]:
+        """Iterate over the rows of the table with a server-side cursor.
+        Sharded models read every shard, one after the other.
+
+        ``where`` is an optional SQL condition, using ``$1``, ``$2``... for ``args``.
+        Only ``prefetch`` rows are held in memory at a time, when ``batch_size``
+        is given lists of up to ``batch_size`` instances are yielded instead.
+
+        A connection and transaction are held until the iteration is exhausted,
+        so close the iterator (``aclose()``) when breaking out early.
+
+        .. code-block:: python3
+
+            async for user in User.stream("verified = $1", True):
+                ...
+        """
+        query = "SELECT * FROM %s" % cls.__tablename__
+        if where:
+            query += " WHERE %s" % where
+
+        return cls._stream(
+            query,
+            args,
+            pools=cls._shard_pools() if cls.shard_key is not None else None,
+            prefetch=prefetch,
+            batch_size=batch_size,
+            lazy=lazy,
+            timeout=timeout,
+        )
+
+    @classmethod
+    async def _stream(
+        cls,
+        query: str,
+        args: Sequence,
+        *,
+        prefetch: int,
+        batch_size: Optional[int],
+        lazy: bool,
+        timeout: Optional[float],
+        pools: Optional[Sequence["Pool"]] = None,
+    ) -> AsyncIterator[Union["Model", List["Model"]]]:
+        kwargs = dict(
+            prefetch=prefetch, batch_size=batch_size, lazy=lazy, timeout=timeout
+        )
+
+        if pools is None:
+            async with cls._acquire(readonly=True) as con:
+                async for item in cls._cursor(con, query, args, **kwargs):
+                    yield item
+            return
+
+        for pool in pools:
+            async with acquire(pool) as con:
+                async for item in cls._cursor(con, query, args, **kwargs):
+                    yield item
+
+    @classmethod
+    async def _cursor(
+        cls,
+        con: "Connection",
+        query: str,
+        args: Sequence,
+        *,
+        prefetch: int,
+        batch_size: Optional[int],
+        lazy: bool,
+        timeout: Optional[float],
+    ) -> AsyncIterator[Union["Model", List["Model"]]]:
+        # Timed from the start of the cursor until it is exhausted or closed,
+        # which includes the time spent by the caller between rows.
+        start = time.perf_counter() if observing() else None
+        rows = 0
+
+        try:
+            async with con.transaction():
+                if batch_size is None:
+                    new = cls.__new__
+                    hydrate = None
+                    async for record in con.cursor(
+                        query, *args, prefetch=prefetch, timeout=timeout
+                    ):
+                        rows += 1
+                        if lazy:
+                            yield cls.from_record(record, lazy=True)
+                            continue
+
+                        if hydrate is None:
+                            hydrate = cls._get_hydrator(record)
+
+                        self = new(cls)
+                        hydrate(self, record)
+                        yield self
+                    return
+
+                cursor = await con.cursor(query, *args, timeout=timeout)
+                while True:
+                    records = await cursor.fetch(batch_size, timeout=timeout)
+                    if not records:
+                        return
+
+                    rows += len(records)
+                    yield cls.from_records(records, lazy=lazy)
+        finally:
+            if start is not None:
+                elapsed = time.perf_counter() - start
+                record_statement(cls.__name__, "CURSOR %s" % query, elapsed, rows)
+
+    @classmethod
+    def create_table_sql(
+        cls,
+        *,
+        exists_ok: bool = True,
+        concurrently: Optional[bool] = None,
+        indexes: bool = True,
+    ) -> str:
+        """Generates the ``CREATE TABLE`` SQL statement, followed by the
+        partitions from :meth:`Partitioning.static_partitions_sql` and the
+        ``CREATE INDEX`` statements of the model unless ``indexes`` is ``False``.
+
+        ``concurrently`` overrides :attr:`Index.concurrently` of every index."""
+        key = ("CREATE TABLE", exists_ok, concurrently, indexes)
+        try:
+            return cls._query_cache[key]
+        except KeyError:
+            pass
+
         statements = []
         builder = ["CREATE TABLE"]
 
@@ -67,30 +647,81 @@ class Model(metaclass=ModelMeta):
 
         builder.append(cls.__tablename__)
 
-        columns = []
-        pks = [col.name for col in cls.columns if col.primary_key]
-
-        for col in cls.columns:
-            columns.append(
-                col.generate_create_table_sql()
-                + ("," if col != cls.columns[-1] or any(pks) else "")
-            )
-
+        columns = [col.generate_create_table_sql() for col in cls.columns]
+        pks = cls.schema.primary_key
         if pks:
             columns.append("PRIMARY KEY (%s)" % ", ".join(pks))
 
-        builder.append("(\n    %s\n)" % "\n    ".join(columns))
+        builder.append("(\n    %s\n)" % ",\n    ".join(columns))
+        if cls.partitioning is not None:
+            builder.append(cls.partitioning.to_sql())
         statements.append(" ".join(builder) + ";")
 
-        if any(col.index for col in cls.columns):
+        if cls.partitioning is not None:
+            statements.extend(
+                cls.partitioning.static_partitions_sql(exists_ok=exists_ok)
+            )
+
+        if indexes and cls.indexes:
             statements.append("")
+            statements.extend(
+                cls.create_indexes_sql(exists_ok=exists_ok, concurrently=concurrently)
+            )
+
+        sql = cls._query_cache[key] = "\n".join(statements)
+        return sql
+
+    @classmethod
+    def create_indexes_sql(
+        cls, *, exists_ok: bool = True, concurrently: Optional[bool] = None
+    ) -> List[str]:
+        """Generates a ``CREATE INDEX`` statement for every index of the model."""
+        key = ("CREATE INDEX", exists_ok, concurrently)
+        try:
+            statements = cls._query_cache[key]
+        except KeyError:
+            statements = cls._query_cache[key] = tuple(
+                index.generate_create_table_sql(
+                    exists_ok=exists_ok, concurrently=concurrently
+                )
+                for index in cls.indexes
+            )
 
-        for col in cls.columns:
-            if col.index:
-                fmt = col.index.generate_create_table_sql()
-                statements.append(fmt)
+        return list(statements)
 
-        return "\n".join(statements)
+    @classmethod
+    def notify_channel(cls) -> str:
+        """The ``NOTIFY`` channel used by the trigger of :meth:`notify_trigger_sql`."""
+        return "postdb_%s" % cls.__tablename__
+
+    @classmethod
+    def notify_trigger_sql(cls) -> str:
+        """Generates the SQL for a trigger publishing the primary key of every
+        updated or deleted row on :meth:`notify_channel`, as a JSON array.
+
+        Used by :meth:`listen` to invalidate caches across processes."""
+        pks = cls.schema.primary_key
+        if not pks:
+            raise SchemaError("%s has no primary key." % cls.__name__)
+
+        name = "%s_notify" % cls.__tablename__
+        return (
+            "CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$\n"
+            "BEGIN\n"
+            "    PERFORM pg_notify('{channel}', json_build_array({keys})::text);\n"
+            "    RETURN NULL;\n"
+            "END;\n"
+            "$$ LANGUAGE plpgsql;\n"
+            "\n"
+            "DROP TRIGGER IF EXISTS {name} ON {table};\n"
+            "CREATE TRIGGER {name} AFTER UPDATE OR DELETE ON {table}\n"
+            "    FOR EACH ROW EXECUTE PROCEDURE {name}();"
+        ).format(
+            name=name,
+            table=cls.__tablename__,
+            channel=cls.notify_channel(),
+            keys=", ".join("OLD.%s" % pk for pk in pks),
+        )
 
     @classmethod
     def drop_table_sql(cls, *, exists_ok: bool = True, cascade: bool = False) -> str:
@@ -104,6 +735,111 @@ class Model(metaclass=ModelMeta):
         builder.append("%s %s;" % (cls.__tablename__, to_cascade))
         return " ".join(builder)
 
+    @classmethod
+    def _primary_pool(cls) -> "Pool":
+        if cls.pool is None:
+            raise TypeError(
+                "Unable to get Connection, please call `Model.create_pool` before using the coroutine."
+            )
+
+        return cls.pool
+
+    @classmethod
+    def _shard_pools(cls, values: Optional[Iterable] = None) -> List["Pool"]:
+        """Returns the pools of the shards owning ``values``, or every shard."""
+        shards = cls.shards
+        if not shards:
+            raise TypeError(
+                "Unable to get Connection, please call `%s.create_shard_pools` "
+                "before using the coroutine." % cls.__name__
+            )
+
+        if values is None:
+            return list(shards)
+
+        return [
+            shards[i]
+            for i in sorted({shard_index(value, len(shards)) for value in values})
+        ]
+
+    @classmethod
+    def _get_pool(cls, readonly: bool = False) -> Union["Pool", "Connection"]:
+        """Returns where to run a statement: the connection of the current
+        :meth:`transaction`, a replica pool for reads, or the primary pool."""
+        con = _connection.get()
+        if con is not None:
+            return con
+
+        replicas = cls.replicas
+        if not readonly or not replicas or _use_primary.get():
+            return cls._primary_pool()
+
+        if cls.replica_strategy == "least_busy":
+            return min(
+                replicas, key=lambda pool: pool.get_size() - pool.get_idle_size()
+            )
+
+        return replicas[next(_replica_counter) % len(replicas)]
+
+    @classmethod
+    @asynccontextmanager
+    async def _acquire(cls, readonly: bool = False) -> AsyncIterator["Connection"]:
+        con = _connection.get()
+        if con is not None:
+            yield con
+            return
+
+        async with acquire(cls._get_pool(readonly)) as con:
+            yield con
+
+    @classmethod
+    @asynccontextmanager
+    async def transaction(cls, **kwargs) -> AsyncIterator["Connection"]:
+        """Run the queries made through postDB in this context in a transaction,
+        on a single connection of the primary pool.
+
+        Nested calls create savepoints. ``kwargs`` are passed to
+        :meth:`asyncpg.connection.Connection.transaction`.
+
+        .. code-block:: python3
+
+            async with Model.transaction():
+                user = await User.get(5)
+                await user.update(verified=True)
+        """
+        con = _connection.get()
+        if con is not None:
+            async with con.transaction(**kwargs):
+                yield con
+            return
+
+        pending = []
+        async with acquire(cls._primary_pool()) as con:
+            try:
+                async with con.transaction(**kwargs):
+                    token = _connection.set(con)
+                    pending_token = _pending_invalidations.set(pending)
+                    try:
+                        yield con
+                    finally:
+                        _pending_invalidations.reset(pending_token)
+                        _connection.reset(token)
+            finally:
+                # After the COMMIT or ROLLBACK, on both the cache is stale.
+                for model, keys in pending:
+                    model._invalidate(keys)
+
+    @staticmethod
+    @contextmanager
+    def use_primary() -> Iterator[None]:
+        """Send reads made in this context to the primary pool instead of the
+        replicas, for example to read a row that was just written."""
+        token = _use_primary.set(True)
+        try:
+            yield
+        finally:
+            _use_primary.reset(token)
+
     @classmethod
     async def create_pool(
         cls,
@@ -112,28 +848,102 @@ class Model(metaclass=ModelMeta):
         min_con: int = 1,
         max_con: int = 10,
         timeout: float = 10.0,
-        loop: BaseEventLoop = None,
+        loop: "BaseEventLoop" = None,
+        replicas: Sequence[str] = (),
+        replica_strategy: Literal["round_robin", "least_busy"] = "round_robin",
+        json_codec: Optional[JSONCodec] = None,
         **pool_kwargs,
     ) -> None:
-        """Populate the internal pool keyword."""
+        """Populate the internal pool keyword.
+
+        ``replicas`` are uris of read replicas, a pool is created for each of them
+        and read only queries are spread over them with ``replica_strategy``.
+        Writes, reads in a :meth:`transaction` and reads in :meth:`use_primary`
+        use the primary pool.
+
+        ``json_codec`` encodes and decodes ``json`` and ``jsonb`` values,
+        by default a :class:`~postDB.codecs.JSONCodec` using :mod:`json`,
+        pass :meth:`JSONCodec.fastest() <postDB.codecs.JSONCodec.fastest>` for orjson or ujson.
+        """
+
+        strategies = ("round_robin", "least_busy")
+        if replica_strategy not in strategies:
+            raise ValueError(
+                "Invalid replica strategy, must be one of: " + ", ".join(strategies)
+            )
+
+        from asyncpg import create_pool
+        from asyncpg.pool import Pool
 
         if isinstance(cls.pool, Pool):
             await cls.pool.close()
 
-        async def init(con: Connection) -> None:
-            await con.set_type_codec(
-                "json", schema="pg_catalog", encoder=json.dumps, decoder=json.loads
+        for replica in cls.replicas:
+            await replica.close()
+
+        init = (json_codec or JSONCodec()).register
+
+        async def connect(dsn: str) -> "Pool":
+            return await create_pool(
+                dsn=dsn,
+                init=init,
+                loop=loop,
+                timeout=timeout,
+                min_size=min_con,
+                max_size=max_con,
+                **pool_kwargs,
             )
 
-        cls.pool = await create_pool(
-            dsn=uri,
-            init=init,
-            loop=loop,
-            timeout=timeout,
-            min_size=min_con,
-            max_size=max_con,
-            **pool_kwargs,
-        )
+        cls.pool = await connect(uri)
+        cls.replicas = [await connect(replica) for replica in replicas]
+        cls.replica_strategy = replica_strategy
+
+    @classmethod
+    async def create_shard_pools(
+        cls,
+        uris: Sequence[str],
+        *,
+        min_con: int = 1,
+        max_con: int = 10,
+        timeout: float = 10.0,
+        json_codec: Optional[JSONCodec] = None,
+        **pool_kwargs,
+    ) -> None:
+        """Create a pool for each shard of a model declared with ``shard_key``.
+
+        Rows are placed on a shard by hashing their shard key value, so ``uris``
+        must always be given in the same order. Queries filtering on the shard key
+        run on the owning shards only, others run on every shard concurrently
+        and their results are merged. Transactions don't span shards.
+
+        .. code-block:: python3
+
+            class Event(Model, shard_key="user_id"):
+                id = Column(types.Integer(big=True), primary_key=True)
+                user_id = Column(types.Integer(big=True))
+
+            await Event.create_shard_pools(["postgres://.../shard0", "postgres://.../shard1"])
+        """
+        if cls.shard_key is None:
+            raise SchemaError("%s has no shard_key." % cls.__name__)
+
+        for shard in cls.shards:
+            await shard.close()
+
+        from asyncpg import create_pool
+
+        init = (json_codec or JSONCodec()).register
+        cls.shards = [
+            await create_pool(
+                dsn=uri,
+                init=init,
+                timeout=timeout,
+                min_size=min_con,
+                max_size=max_con,
+                **pool_kwargs,
+            )
+            for uri in uris
+        ]
 
     @classmethod
     async def create_table(
@@ -141,19 +951,94 @@ class Model(metaclass=ModelMeta):
         *,
         verbose: bool = False,
         exists_ok: bool = True,
+        notify: bool = False,
+        concurrently: Optional[bool] = None,
     ):
-        """Create the PostgreSQL Table for this Model."""
-        if cls.pool is None:
-            raise TypeError(
-                "Unable to get Connection, please call `Model.create_pool` before using the coroutine."
+        """Create the PostgreSQL Table for this Model.
+
+        With ``notify=True`` the trigger from :meth:`notify_trigger_sql`
+        is installed as well. ``concurrently`` overrides :attr:`Index.concurrently`
+        of every index, concurrent indexes are created one statement at a time
+        after the table since they can't be created in a transaction.
+
+        Sharded models create the table on every shard. Models partitioned
+        by a time interval create their partitions with :meth:`maintain_partitions`."""
+
+        if concurrently is None:
+            concurrent = [index for index in cls.indexes if index.concurrently]
+        else:
+            concurrent = cls.indexes if concurrently else []
+
+        statements = [
+            cls.create_table_sql(
+                exists_ok=exists_ok, concurrently=concurrently, indexes=not concurrent
             )
+        ]
+        if concurrent:
+            statements[0] = "\n".join(
+                [statements[0]]
+                + [
+                    index.generate_create_table_sql(exists_ok=exists_ok)
+                    for index in cls.indexes
+                    if index not in concurrent
+                ]
+            )
+
+        if notify:
+            statements[0] += "\n\n" + cls.notify_trigger_sql()
 
-        sql = cls.create_table_sql(exists_ok=exists_ok)
+        statements.extend(
+            index.generate_create_table_sql(exists_ok=exists_ok, concurrently=True)
+            for index in concurrent
+        )
 
-        if verbose:
-            print(sql)
+        # Concurrent indexes can't be created in a transaction,
+        # which a script of multiple statements implicitly is.
+        status = await cls._run_ddl(statements, verbose=verbose)
 
-        return await cls.pool.execute(sql)
+        if cls._time_partitioned():
+            await cls.maintain_partitions(expire=False, verbose=verbose)
+
+        return status
+
+    @classmethod
+    def _index_statements(
+        cls, *, exists_ok: bool = True, concurrently: Optional[bool] = None
+    ) -> List[str]:
+        """Returns the indexes as a script of the regular ones,
+        followed by a statement per concurrent one."""
+        statements = []
+        regular = []
+        for index in cls.indexes:
+            if index.concurrently if concurrently is None else concurrently:
+                statements.append(
+                    index.generate_create_table_sql(
+                        exists_ok=exists_ok, concurrently=True
+                    )
+                )
+            else:
+                regular.append(
+                    index.generate_create_table_sql(
+                        exists_ok=exists_ok, concurrently=False
+                    )
+                )
+
+        if regular:
+            statements.insert(0, "\n".join(regular))
+
+        return statements
+
+    @classmethod
+    async def _run_ddl(cls, statements: List[str], *, verbose: bool = False):
+        status = None
+        for pool in cls._ddl_pools():
+            for sql in statements:
+                if verbose:
+                    print(sql)
+
+                status = await run(cls, pool, "execute", sql)
+
+        return status
 
     @classmethod
     async def drop_table(
@@ -163,18 +1048,452 @@ class Model(metaclass=ModelMeta):
         cascade: bool = True,
         exists_ok: bool = True,
     ):
-        """Drop the PostgreSQL Table for this Model."""
-        if cls.pool is None:
-            raise TypeError(
-                "Unable to get Connection, please call `Model.create_pool` before using the coroutine."
+        """Drop the PostgreSQL Table for this Model, and clear its cache."""
+        sql = cls.drop_table_sql(exists_ok=exists_ok, cascade=cascade)
+
+        status = await cls._run_ddl([sql], verbose=verbose)
+        cls._invalidate()
+        return status
+
+    @classmethod
+    async def create_all(
+        cls,
+        *models: Type["Model"],
+        verbose: bool = False,
+        exists_ok: bool = True,
+        notify: bool = False,
+        concurrently: Optional[bool] = None,
+    ) -> None:
+        """Create the tables of ``models``, by default of every subclass.
+
+        Tables are created in the order of their :class:`~postDB.types.ForeignKey`
+        references, tables not depending on each other concurrently, and the
+        indexes once all the tables exist. Inside a :meth:`transaction` the
+        statements run one after another on its connection.
+        See :meth:`create_table` for the other arguments."""
+        layers = cls._dependency_layers(models or cls._schema_models())
+
+        for layer in layers:
+            await cls._ddl_gather(
+                model._run_ddl(
+                    [
+                        model.create_table_sql(exists_ok=exists_ok, indexes=False)
+                        + ("\n\n" + model.notify_trigger_sql() if notify else "")
+                    ],
+                    verbose=verbose,
+                )
+                for model in layer
             )
 
-        sql = cls.drop_table_sql(exists_ok=exists_ok, cascade=cascade)
+        await cls._ddl_gather(
+            model._run_ddl(
+                model._index_statements(exists_ok=exists_ok, concurrently=concurrently),
+                verbose=verbose,
+            )
+            for layer in layers
+            for model in layer
+            if model.indexes
+        )
+
+        await cls._ddl_gather(
+            model.maintain_partitions(expire=False, verbose=verbose)
+            for layer in layers
+            for model in layer
+            if model._time_partitioned()
+        )
+
+    @classmethod
+    async def drop_all(
+        cls,
+        *models: Type["Model"],
+        verbose: bool = False,
+        cascade: bool = False,
+        exists_ok: bool = True,
+    ) -> None:
+        """Drop the tables of ``models``, by default of every subclass,
+        the referencing tables before the tables they reference."""
+        layers = cls._dependency_layers(models or cls._schema_models())
+
+        for layer in reversed(layers):
+            await cls._ddl_gather(
+                model.drop_table(verbose=verbose, cascade=cascade, exists_ok=exists_ok)
+                for model in layer
+            )
 
-        if verbose:
-            print(sql)
+    @classmethod
+    def create_all_sql(cls, *models: Type["Model"], exists_ok: bool = True) -> str:
+        """Generates the SQL of :meth:`create_all` as a single script,
+        with the indexes created without ``CONCURRENTLY``."""
+        layers = cls._dependency_layers(models or cls._schema_models())
+        tables = [
+            model.create_table_sql(exists_ok=exists_ok, indexes=False)
+            for layer in layers
+            for model in layer
+        ]
+        indexes = [
+            sql
+            for layer in layers
+            for model in layer
+            for sql in model.create_indexes_sql(exists_ok=exists_ok, concurrently=False)
+        ]
+        return "\n\n".join(tables + (["\n".join(indexes)] if indexes else []))
+
+    @classmethod
+    async def schema_diff(cls, *models: Type["Model"]) -> List[SchemaDiff]:
+        """Compare ``models``, by default every subclass which isn't sharded,
+        to their tables in the database.
+
+        The tables are read from ``pg_catalog`` into :class:`Column` and
+        :class:`~postDB.types.SQLType` objects, see :class:`SchemaDiff`."""
+        return await introspection.diff_schema(
+            cls, models or cls._introspected_models()
+        )
 
-        return await cls.pool.execute(sql)
+    @classmethod
+    async def sync_schema(
+        cls, *models: Type["Model"], verbose: bool = False
+    ) -> List[SchemaDiff]:
+        """Create the missing tables, columns and indexes of ``models``,
+        by default every subclass which isn't sharded.
+
+        A fingerprint of the declared schema of every model is stored in the
+        ``postdb_schema`` table, when none of them changed since the last sync
+        this is a single query. Otherwise the tables are compared with
+        :meth:`schema_diff` and only the missing parts are created. Differences
+        that aren't applied are logged, and checked again on the next sync.
+
+        Returns the differences that were found."""
+        return await introspection.sync_schema(
+            cls, models or cls._introspected_models(), verbose=verbose
+        )
+
+    @classmethod
+    def _introspected_models(cls) -> List[Type["Model"]]:
+        # Sharded tables live on several databases, they can't be introspected.
+        return [model for model in cls._schema_models() if model.shard_key is None]
+
+    @classmethod
+    async def maintain_partitions(
+        cls,
+        *,
+        now: Optional[Union[datetime.date, datetime.datetime]] = None,
+        drop: bool = True,
+        expire: bool = True,
+        verbose: bool = False,
+    ) -> PartitionMaintenance:
+        """Create the partitions of the current and the :attr:`Partitioning.premake`
+        upcoming intervals which don't exist yet, then detach the partitions older
+        than :attr:`Partitioning.retention` intervals and, with ``drop=True``, drop them.
+        ``expire=False`` only creates partitions, as :meth:`create_table` does.
+
+        Meant to run periodically, for example daily. ``now`` defaults to the current
+        time in UTC. Raises :exc:`SchemaError` if the model isn't partitioned by a
+        time interval."""
+        return await partition.maintain_partitions(
+            cls, now=now, drop=drop, expire=expire, verbose=verbose
+        )
+
+    @classmethod
+    def _time_partitioned(cls) -> bool:
+        return cls.partitioning is not None and cls.partitioning.interval is not None
+
+    @classmethod
+    def _schema_models(cls) -> List[Type["Model"]]:
+        models = list(cls._walk_models())
+        if "schema" in cls.__dict__:
+            models.insert(0, cls)
+        return models
+
+    @staticmethod
+    def _dependency_layers(
+        models: Sequence[Type["Model"]],
+    ) -> List[List[Type["Model"]]]:
+        """Returns ``models`` grouped in layers, the tables of every layer
+        only reference tables of the layers before it."""
+        tables = {model.__tablename__: model for model in models}
+        dependencies = {}
+        for model in models:
+            dependencies[model] = {
+                tables[col.column_type.model]
+                for col in model.columns
+                if isinstance(col.column_type, ForeignKey)
+                and col.column_type.model in tables
+                and col.column_type.model != model.__tablename__
+            }
+
+        layers = []
+        while dependencies:
+            layer = [model for model, needs in dependencies.items() if not needs]
+            if not layer:
+                raise SchemaError(
+                    "Circular ForeignKey references between %s."
+                    % ", ".join(model.__tablename__ for model in dependencies)
+                )
+
+            for model in layer:
+                del dependencies[model]
+            for needs in dependencies.values():
+                needs.difference_update(layer)
+
+            layers.append(layer)
+
+        return layers
+
+    @staticmethod
+    async def _ddl_gather(coros: Iterable[Awaitable]) -> None:
+        # A transaction pins a single connection, which runs one statement at a time.
+        if _connection.get() is not None:
+            for coro in coros:
+                await coro
+            return
+
+        await gather(*coros)
+
+    @classmethod
+    def _ddl_pools(cls) -> List[Union["Pool", "Connection"]]:
+        if cls.shard_key is not None:
+            return cls._shard_pools()
+        return [cls._get_pool()]
+
+    @classmethod
+    async def bulk_insert(
+        cls,
+        rows: Iterable[Union["Model", dict]],
+        *,
+        chunk_size: int = 10000,
+        timeout: Optional[float] = None,
+    ) -> int:
+        """Insert many rows at once using the binary ``COPY`` protocol.
+
+        ``rows`` can be instances of the model or dicts of column values,
+        and may be any iterable (including generators), it is consumed
+        ``chunk_size`` rows at a time. :class:`~postDB.types.Serial` columns
+        are left to the database and missing values fall back to the column default.
+
+        All chunks are copied in a single transaction.
+        Returns the number of rows inserted."""
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be greater than 0")
+
+        columns = [
+            col for col in cls.columns if not isinstance(col.column_type, Serial)
+        ]
+        names = [col.name for col in columns]
+        to_record = cls._record_factory(columns)
+
+        async def send(con: "Connection", chunk: List[tuple]) -> int:
+            await run(
+                cls,
+                con,
+                "copy_records_to_table",
+                cls.__tablename__,
+                records=chunk,
+                columns=names,
+                timeout=timeout,
+            )
+            return len(chunk)
+
+        return await cls._bulk(map(to_record, rows), names, chunk_size, send)
+
+    @classmethod
+    async def _bulk(
+        cls,
+        records: Iterable[tuple],
+        names: List[str],
+        chunk_size: int,
+        send: Callable[["Connection", List[tuple]], Awaitable[int]],
+    ) -> int:
+        """Sends ``records`` in chunks with ``send`` in a single transaction.
+
+        Sharded models hold a transaction on every shard and send each chunk
+        split by owning shard, to all shards concurrently."""
+        if cls.shard_key is None:
+            total = 0
+            async with cls._acquire() as con:
+                async with con.transaction():
+                    for chunk in chunked(records, chunk_size):
+                        total += await send(con, chunk)
+            return total
+
+        try:
+            position = names.index(cls.shard_key)
+        except ValueError:
+            raise SchemaError(
+                "The shard key %s is required to write rows." % cls.shard_key
+            ) from None
+
+        async with AsyncExitStack() as stack:
+            connections = []
+            for pool in cls._shard_pools():
+                con = await stack.enter_async_context(acquire(pool))
+                await stack.enter_async_context(con.transaction())
+                connections.append(con)
+
+            total = 0
+            shards = len(connections)
+            for chunk in chunked(records, chunk_size):
+                groups = [[] for _ in connections]
+                for record in chunk:
+                    groups[shard_index(record[position], shards)].append(record)
+
+                counts = await gather(
+                    *(
+                        send(con, group)
+                        for con, group in zip(connections, groups)
+                        if group
+                    )
+                )
+                total += sum(counts)
+
+        return total
+
+    @classmethod
+    async def bulk_upsert(
+        cls,
+        rows: Iterable[Union["Model", dict]],
+        *,
+        conflict: Optional[Sequence[str]] = None,
+        update: Optional[Sequence[str]] = None,
+        chunk_size: int = 5000,
+        timeout: Optional[float] = None,
+    ) -> int:
+        """Insert or update many rows, sending one statement per chunk.
+
+        Each chunk is sent as arrays and expanded with ``unnest``::
+
+            INSERT INTO ... SELECT * FROM unnest($1::type[], ...)
+            ON CONFLICT (...) DO UPDATE SET ...
+
+        ``conflict`` defaults to the primary key columns, or the unique column
+        if the model has no primary key and a single one. ``update`` defaults to every other column,
+        when there is nothing to update ``DO NOTHING`` is used instead.
+        Rows sharing a conflict key within a chunk are collapsed, the last one wins.
+
+        All chunks are sent in a single transaction.
+        Returns the number of rows sent."""
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be greater than 0")
+
+        by_name = cls.schema.by_name
+
+        if conflict is None:
+            conflict = list(cls.schema.primary_key)
+            if not conflict:
+                unique = [col.name for col in cls.columns if col.unique]
+                if len(unique) != 1:
+                    # Separately unique columns are separate constraints,
+                    # none of them matches a conflict target of all of them.
+                    raise SchemaError(
+                        "%s has no primary key and %s unique columns, "
+                        "pass the conflict target with conflict=."
+                        % (cls.__name__, len(unique) or "no")
+                    )
+                conflict = unique
+
+        for name in (*conflict, *(update or ())):
+            if name not in by_name:
+                raise ValueError(
+                    "%s is not a attribute of the %s Model." % (name, cls.__name__)
+                )
+
+        columns = [
+            col
+            for col in cls.columns
+            if col.name in conflict or not isinstance(col.column_type, Serial)
+        ]
+        for col in columns:
+            if isinstance(col.column_type, Array):
+                raise SchemaError(
+                    "Cannot upsert %s, array columns can not be unnested." % col.name
+                )
+
+        if update is None:
+            update = [col.name for col in columns if col.name not in conflict]
+
+        builder = [
+            "INSERT INTO %s (%s)"
+            % (cls.__tablename__, ", ".join(col.name for col in columns)),
+            "SELECT * FROM unnest(%s)"
+            % ", ".join(
+                "$%d::%s[]" % (i, col.column_type.to_base_sql())
+                for i, col in enumerate(columns, 1)
+            ),
+            "ON CONFLICT (%s)" % ", ".join(conflict),
+        ]
+        if update:
+            builder.append(
+                "DO UPDATE SET "
+                + ", ".join("%s = EXCLUDED.%s" % (name, name) for name in update)
+            )
+        else:
+            builder.append("DO NOTHING")
+        sql = "\n".join(builder)
+
+        to_record = cls._record_factory(columns)
+        key_positions = [i for i, col in enumerate(columns) if col.name in conflict]
+
+        # The cache is disabled while a CacheListener reconnects,
+        # use the same one from the first chunk to the invalidation.
+        cache = cls.cache
+        pks = cls.schema.primary_key
+        track = cache is not None and set(conflict) == set(pks)
+        written = set()
+
+        async def send(con: "Connection", chunk: List[tuple]) -> int:
+            unique = {
+                tuple(record[i] for i in key_positions): record for record in chunk
+            }
+            await run(cls, con, "execute", sql, *zip(*unique.values()), timeout=timeout)
+
+            if track and len(written) <= cache.maxsize:
+                written.update(unique)
+
+            return len(unique)
+
+        total = await cls._bulk(
+            map(to_record, rows), [col.name for col in columns], chunk_size, send
+        )
+
+        if track and len(written) <= cache.maxsize:
+            cls._invalidate(written, cache)
+        else:
+            cls._invalidate(cache=cache)
+
+        return total
+
+    @classmethod
+    def _record_factory(cls, columns: List[Column]) -> Callable[..., tuple]:
+        defaults = [(col.name, col.default) for col in columns]
+
+        def to_record(row) -> tuple:
+            if isinstance(row, dict):
+                return tuple(row.get(name, default) for name, default in defaults)
+            return tuple(getattr(row, name, default) for name, default in defaults)
+
+        return to_record
+
+    @classmethod
+    async def listen(cls, *models: Type["Model"]) -> CacheListener:
+        """Start evicting cache entries when rows are changed by other processes.
+
+        Listens on a dedicated connection from the pool for the notifications
+        sent by the :meth:`notify_trigger_sql` triggers of ``models``,
+        by default every model with a cache. Call :meth:`CacheListener.close`
+        to release the connection."""
+        pool = cls._primary_pool()
+
+        if not models:
+            models = [model for model in cls._walk_models() if model.cache is not None]
+
+        listener = CacheListener(pool, models)
+        await listener.start()
+        return listener
+
+    @classmethod
+    def _walk_models(cls) -> Iterator[Type["Model"]]:
+        for model in cls.__subclasses__():
+            yield model
+            yield from model._walk_models()
 
     @classmethod
     def all_models(cls) -> List[Type["Model"]]:
@@ -183,12 +1502,12 @@ class Model(metaclass=ModelMeta):
 
     def as_dict(self, *columns) -> dict:
         """Returns a dict of attribute:value, only containing the columns specified."""
-        all_column_names = [col.name for col in self.columns]
+        schema = type(self).schema
         if not columns:
-            columns = all_column_names
+            columns = schema.names
         else:
             for col in columns:
-                if col not in all_column_names:
+                if col not in schema.by_name:
                     raise ValueError(
                         "%s is not a attribute of the %s Model."
                         % (col, type(self).__name__)
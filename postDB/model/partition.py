@@ -0,0 +1,373 @@
+from typing import (
+    List,
+    Literal,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TYPE_CHECKING,
+    Union,
+)
+import datetime
+
+from postDB.exceptions import SchemaError
+from postDB.types import Date, DateTime
+
+if TYPE_CHECKING:
+    from postDB.model.column import Column
+    from postDB.model.index import Index
+    from postDB.model.model import Model
+
+
+#: ``strftime`` format of the partition name suffix for every interval.
+INTERVALS = {"day": "%Y%m%d", "week": "%Y%m%d", "month": "%Y%m", "year": "%Y"}
+
+PARTITIONS_SQL = """
+SELECT child.relname AS name
+FROM pg_catalog.pg_inherits AS i
+JOIN pg_catalog.pg_class AS child ON child.oid = i.inhrelid
+JOIN pg_catalog.pg_class AS parent ON parent.oid = i.inhparent
+JOIN pg_catalog.pg_namespace AS n ON n.oid = parent.relnamespace
+WHERE parent.relname = $1 AND n.nspname = current_schema()
+"""
+
+
+class PartitionMaintenance(NamedTuple):
+    """The partitions changed by :meth:`Model.maintain_partitions`."""
+
+    created: List[str]
+    detached: List[str]
+    dropped: List[str]
+
+
+class Partitioning:
+    """Class to declare a :class:`Model` as a partitioned table,
+    passed with the ``partition_by`` class keyword.
+
+    ``method="range"`` with an ``interval`` creates a partition per day, week,
+    month or year of a :class:`~postDB.types.Date` or :class:`~postDB.types.DateTime`
+    column. :meth:`Model.maintain_partitions` creates the current and ``premake``
+    upcoming partitions, and detaches and drops the ones older than ``retention``
+    intervals, so expiring rows doesn't need a ``DELETE``.
+
+    ``method="hash"`` creates ``modulus`` partitions and ``method="list"`` a
+    partition per entry of ``values``, mapping a name suffix to the values it holds.
+    ``default=True`` adds a partition for the rows matching no other partition.
+
+    .. code-block:: python3
+
+        class Event(
+            Model,
+            partition_by=Partitioning("created_at", interval="month", retention=12),
+        ):
+            id = Column(types.Integer(big=True))
+            created_at = Column(types.DateTime(timezone=True))
+            kind = Column(types.String())
+
+    PostgreSQL requires the primary key and unique indexes to include the
+    partition column, and builds the indexes of the partitions when they are
+    created, indexes are therefore never created ``CONCURRENTLY``."""
+
+    __slots__ = (
+        "column",
+        "method",
+        "interval",
+        "premake",
+        "retention",
+        "modulus",
+        "values",
+        "default",
+        "model",
+    )
+
+    def __init__(
+        self,
+        column: str,
+        *,
+        method: Literal["range", "list", "hash"] = "range",
+        interval: Optional[Literal["day", "week", "month", "year"]] = None,
+        premake: int = 3,
+        retention: Optional[int] = None,
+        modulus: Optional[int] = None,
+        values: Optional[Mapping[str, Sequence]] = None,
+        default: bool = False,
+    ):
+        methods = ("range", "list", "hash")
+        assert (
+            method in methods
+        ), "Invalid partition method, must be one of: " + ", ".join(methods)
+
+        if interval is not None:
+            if method != "range":
+                raise SchemaError("Only range partitions can have an interval.")
+            if interval not in INTERVALS:
+                raise SchemaError(
+                    "Invalid partition interval, must be one of: "
+                    + ", ".join(INTERVALS)
+                )
+        elif retention is not None:
+            raise SchemaError("A partition retention needs an interval.")
+
+        if retention is not None and retention < 1:
+            raise SchemaError("The partition retention must be at least 1.")
+
+        if method == "hash":
+            if modulus is None or modulus < 1:
+                raise SchemaError("hash partitions need a modulus of at least 1.")
+            if default:
+                raise SchemaError("hash partitions can't have a default partition.")
+        elif modulus is not None:
+            raise SchemaError("Only hash partitions can have a modulus.")
+
+        if values is not None and method != "list":
+            raise SchemaError("Only list partitions can have values.")
+
+        self.model = None
+
+        self.column: str = column
+        self.method: str = method
+        self.interval: Optional[str] = interval
+        self.premake: int = premake
+        self.retention: Optional[int] = retention
+        self.modulus: Optional[int] = modulus
+        self.values: Mapping[str, Tuple] = {
+            suffix: tuple(entries) for suffix, entries in (values or {}).items()
+        }
+        self.default: bool = default
+
+    def validate(
+        self,
+        name: str,
+        columns: Sequence["Column"],
+        primary_key: Sequence[str],
+        indexes: Sequence["Index"],
+    ) -> None:
+        """Raises :exc:`SchemaError` when the model ``name`` can't be partitioned by this."""
+        col = next((col for col in columns if col.name == self.column), None)
+        if col is None:
+            raise SchemaError(
+                "Unknown partition column %s on %s." % (self.column, name)
+            )
+
+        if self.interval is not None and not isinstance(
+            col.column_type, (Date, DateTime)
+        ):
+            raise SchemaError(
+                "The partition column of %s must be a Date or DateTime "
+                "to be partitioned by %s." % (name, self.interval)
+            )
+
+        if primary_key and self.column not in primary_key:
+            raise SchemaError(
+                "The primary key of %s must include the partition column %s."
+                % (name, self.column)
+            )
+
+        for col in columns:
+            if col.unique and col.name != self.column:
+                raise SchemaError(
+                    "%s.%s can't be unique, unique constraints of a partitioned "
+                    "table must include the partition column %s."
+                    % (name, col.name, self.column)
+                )
+
+        for index in indexes:
+            if index.unique and self.column not in index.elements:
+                raise SchemaError(
+                    "Unique indexes of %s must include the partition column %s."
+                    % (name, self.column)
+                )
+
+    def to_sql(self) -> str:
+        """Returns the ``PARTITION BY`` clause of the table."""
+        return "PARTITION BY %s (%s)" % (self.method.upper(), self.column)
+
+    def _create(self, name: str, bound: str, exists_ok: bool) -> str:
+        builder = ["CREATE TABLE"]
+        if exists_ok:
+            builder.append("IF NOT EXISTS")
+        builder.extend([name, "PARTITION OF", self.model.__tablename__, bound])
+        return " ".join(builder) + ";"
+
+    def static_partitions_sql(self, *, exists_ok: bool = True) -> List[str]:
+        """Generates the ``CREATE TABLE`` statements of the partitions
+        which don't depend on time: hash, list and default partitions."""
+        table = self.model.__tablename__
+        statements = []
+
+        if self.method == "hash":
+            statements.extend(
+                self._create(
+                    "%s_p%d" % (table, remainder),
+                    "FOR VALUES WITH (MODULUS %d, REMAINDER %d)"
+                    % (self.modulus, remainder),
+                    exists_ok,
+                )
+                for remainder in range(self.modulus)
+            )
+
+        for suffix, entries in self.values.items():
+            statements.append(
+                self._create(
+                    "%s_%s" % (table, suffix),
+                    "FOR VALUES IN (%s)" % ", ".join(map(self.literal, entries)),
+                    exists_ok,
+                )
+            )
+
+        if self.default:
+            statements.append(self._create("%s_default" % table, "DEFAULT", exists_ok))
+
+        return statements
+
+    def literal(self, value) -> str:
+        """Returns ``value`` as a SQL literal of a partition bound."""
+        if value is None:
+            return "NULL"
+        if isinstance(value, bool):
+            return str(value).upper()
+        if isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, datetime.date):
+            column_type = self.model.schema.by_name[self.column].column_type
+            if isinstance(column_type, DateTime) and column_type.timezone:
+                value = datetime.datetime.combine(
+                    value, datetime.time(), datetime.timezone.utc
+                )
+            value = value.isoformat()
+        return "'%s'" % str(value).replace("'", "''")
+
+    def period_start(
+        self, day: Union[datetime.date, datetime.datetime]
+    ) -> datetime.date:
+        """Returns the first day of the interval containing ``day``."""
+        if isinstance(day, datetime.datetime):
+            if day.tzinfo is not None:
+                day = day.astimezone(datetime.timezone.utc)
+            day = day.date()
+
+        if self.interval == "week":
+            return day - datetime.timedelta(days=day.weekday())
+        if self.interval == "month":
+            return day.replace(day=1)
+        if self.interval == "year":
+            return day.replace(month=1, day=1)
+        return day
+
+    def shift(self, start: datetime.date, periods: int) -> datetime.date:
+        """Returns the start of the interval ``periods`` intervals after ``start``."""
+        if self.interval == "day":
+            return start + datetime.timedelta(days=periods)
+        if self.interval == "week":
+            return start + datetime.timedelta(weeks=periods)
+        if self.interval == "year":
+            return start.replace(year=start.year + periods)
+
+        month = start.year * 12 + start.month - 1 + periods
+        return start.replace(year=month // 12, month=month % 12 + 1)
+
+    def partition_name(self, start: datetime.date) -> str:
+        """Returns the name of the partition of the interval starting at ``start``."""
+        return "%s_p%s" % (
+            self.model.__tablename__,
+            start.strftime(INTERVALS[self.interval]),
+        )
+
+    def partition_start(self, name: str) -> Optional[datetime.date]:
+        """Returns the start of the interval of the partition ``name``,
+        or ``None`` if it wasn't created by :meth:`partition_sql`."""
+        prefix = "%s_p" % self.model.__tablename__
+        if not name.startswith(prefix):
+            return None
+
+        _, _, suffix = name.partition(prefix)
+        try:
+            start = datetime.datetime.strptime(suffix, INTERVALS[self.interval]).date()
+        except ValueError:
+            return None
+
+        return start if self.period_start(start) == start else None
+
+    def partition_sql(self, start: datetime.date, *, exists_ok: bool = True) -> str:
+        """Generates the ``CREATE TABLE`` statement of the partition
+        of the interval starting at ``start``."""
+        return self._create(
+            self.partition_name(start),
+            "FOR VALUES FROM (%s) TO (%s)"
+            % (self.literal(start), self.literal(self.shift(start, 1))),
+            exists_ok,
+        )
+
+
+async def maintain_partitions(
+    model: Type["Model"],
+    *,
+    now: Optional[Union[datetime.date, datetime.datetime]] = None,
+    drop: bool = True,
+    expire: bool = True,
+    verbose: bool = False,
+) -> PartitionMaintenance:
+    from postDB.instrumentation import run
+
+    partitioning: Optional[Partitioning] = model.partitioning
+    if partitioning is None or partitioning.interval is None:
+        raise SchemaError("%s isn't partitioned by a time interval." % model.__name__)
+
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+    current = partitioning.period_start(now)
+    wanted = [
+        partitioning.shift(current, periods)
+        for periods in range(partitioning.premake + 1)
+    ]
+    cutoff = None
+    if expire and partitioning.retention is not None:
+        cutoff = partitioning.shift(current, -partitioning.retention)
+
+    table = model.__tablename__
+    # Detaching concurrently only waits for the queries using the partition,
+    # it isn't possible with a default partition.
+    detach = "ALTER TABLE %s DETACH PARTITION %s"
+    if not partitioning.default:
+        detach += " CONCURRENTLY"
+
+    result = PartitionMaintenance([], [], [])
+
+    async def execute(pool, sql: str):
+        if verbose:
+            print(sql)
+        await run(model, pool, "execute", sql)
+
+    for pool in model._ddl_pools():
+        rows = await run(model, pool, "fetch", PARTITIONS_SQL, table)
+        existing = {row["name"] for row in rows}
+
+        for start in wanted:
+            name = partitioning.partition_name(start)
+            if name not in existing:
+                await execute(pool, partitioning.partition_sql(start))
+                result.created.append(name)
+
+        if cutoff is None:
+            continue
+
+        for name in sorted(existing):
+            start = partitioning.partition_start(name)
+            if start is None or start >= cutoff:
+                continue
+
+            await execute(pool, detach % (table, name) + ";")
+            result.detached.append(name)
+
+            if drop:
+                await execute(pool, "DROP TABLE IF EXISTS %s;" % name)
+                result.dropped.append(name)
+
+    if result.detached:
+        # The rows of detached partitions are gone from the table.
+        model._invalidate()
+
+    return result
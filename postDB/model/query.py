@@ -0,0 +1,522 @@
+from collections import namedtuple
+from typing import (
+    Optional,
+    List,
+    Tuple,
+    Dict,
+    Any,
+    AsyncIterator,
+    Union,
+    Sequence,
+    TYPE_CHECKING,
+)
+import warnings
+import base64
+import json
+
+from postDB.exceptions import SchemaError
+from postDB.instrumentation import run
+from postDB.model.shard import merge_records, merge_status, gather
+
+if TYPE_CHECKING:
+    from postDB.model.model import Model
+
+
+Page = namedtuple("Page", "items after")
+
+OPERATORS = {
+    "eq": "%s = %s",
+    "ne": "%s <> %s",
+    "lt": "%s < %s",
+    "le": "%s <= %s",
+    "gt": "%s > %s",
+    "ge": "%s >= %s",
+    "in": "%s = ANY(%s)",
+}
+
+
+class Query:
+    """A ``SELECT``, ``UPDATE`` or ``DELETE`` query against a :class:`Model`.
+
+    Queries are built with :meth:`Model.select` and :meth:`Model.where`,
+    every method returns a new query so partial queries can be reused.
+
+    The SQL is compiled once per query shape (the columns, conditions, ordering
+    and whether there is a limit) and cached on the model, the values are
+    always sent as parameters.
+
+    .. code-block:: python3
+
+        users = await User.where(verified=True, id__gt=10).order_by("-id").limit(5).fetch()
+        await User.where(id=5).update(username="frank")
+    """
+
+    __slots__ = (
+        "model",
+        "_columns",
+        "_conditions",
+        "_params",
+        "_order",
+        "_limit",
+        "_prefetch",
+    )
+
+    def __init__(self, model: "Model"):
+        self.model = model
+        self._columns: Optional[Tuple[str, ...]] = None
+        self._conditions: Tuple[Tuple[str, str], ...] = ()
+        self._params: Tuple[Any, ...] = ()
+        self._order: Tuple[Tuple[str, str], ...] = ()
+        self._limit: Optional[int] = None
+        self._prefetch: Tuple[Tuple[str, ...], Dict[str, str]] = ((), {})
+
+    def _copy(self) -> "Query":
+        query = Query.__new__(Query)
+        query.model = self.model
+        query._columns = self._columns
+        query._conditions = self._conditions
+        query._params = self._params
+        query._order = self._order
+        query._limit = self._limit
+        query._prefetch = self._prefetch
+        return query
+
+    def _check_column(self, name: str) -> str:
+        if name not in self.model.schema.by_name:
+            raise ValueError(
+                "%s is not a attribute of the %s Model." % (name, self.model.__name__)
+            )
+        return name
+
+    def select(self, *columns: str) -> "Query":
+        """Only select the given columns, all columns are selected by default."""
+        query = self._copy()
+        query._columns = tuple(self._check_column(name) for name in columns) or None
+        return query
+
+    def where(self, **conditions) -> "Query":
+        """Add conditions, joined with ``AND``.
+
+        Keywords are column names, optionally followed by one of the lookups
+        ``__eq``, ``__ne``, ``__lt``, ``__le``, ``__gt``, ``__ge`` or ``__in``.
+        Comparing with ``None`` generates ``IS NULL`` / ``IS NOT NULL``."""
+        query = self._copy()
+        shape = list(self._conditions)
+        params = list(self._params)
+
+        for key, value in conditions.items():
+            name, _, op = key.partition("__")
+            op = op or "eq"
+            if op not in OPERATORS:
+                raise ValueError("Unknown lookup %r." % op)
+
+            self._check_column(name)
+
+            if value is None and op in ("eq", "ne"):
+                op = "isnull" if op == "eq" else "notnull"
+            else:
+                params.append(value)
+
+            shape.append((name, op))
+
+        query._conditions = tuple(shape)
+        query._params = tuple(params)
+        return query
+
+    def order_by(self, *columns: str) -> "Query":
+        """Order by the given columns, prefix a column with ``-`` for descending order."""
+        query = self._copy()
+        query._order = tuple(
+            (
+                (self._check_column(name[1:]), "DESC")
+                if name.startswith("-")
+                else (self._check_column(name), "ASC")
+            )
+            for name in columns
+        )
+        return query
+
+    def limit(self, limit: Optional[int]) -> "Query":
+        """Limit the amount of rows returned."""
+        query = self._copy()
+        query._limit = limit
+        return query
+
+    def prefetch(self, *columns: str, **named: str) -> "Query":
+        """Load the rows referenced by these foreign key columns
+        along with the result, see :meth:`Model.prefetch`."""
+        query = self._copy()
+        previous_columns, previous_named = self._prefetch
+        query._prefetch = (previous_columns + columns, {**previous_named, **named})
+        return query
+
+    async def _load_related(self, instances: List["Model"]) -> None:
+        columns, named = self._prefetch
+        if instances and (columns or named):
+            await self.model.prefetch(instances, *columns, **named)
+
+    def _compile_where(self, start: int, extra: Tuple[str, ...] = ()) -> str:
+        builder = []
+        i = start
+        for name, op in self._conditions:
+            if op == "isnull":
+                builder.append("%s IS NULL" % name)
+            elif op == "notnull":
+                builder.append("%s IS NOT NULL" % name)
+            else:
+                builder.append(OPERATORS[op] % (name, "$%d" % i))
+                i += 1
+
+        builder.extend(extra)
+
+        if not builder:
+            return ""
+        return " WHERE " + " AND ".join(builder)
+
+    def _compile_select(self) -> str:
+        key = (
+            "SELECT",
+            self._columns,
+            self._conditions,
+            self._order,
+            self._limit is not None,
+        )
+        cache = self.model._query_cache
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+
+        sql = "SELECT %s FROM %s" % (
+            ", ".join(self._columns) if self._columns else "*",
+            self.model.__tablename__,
+        )
+        sql += self._compile_where(1)
+
+        if self._order:
+            sql += " ORDER BY " + ", ".join("%s %s" % pair for pair in self._order)
+
+        if self._limit is not None:
+            sql += " LIMIT $%d" % (len(self._params) + 1)
+
+        cache[key] = sql
+        return sql
+
+    def _select_params(self) -> tuple:
+        if self._limit is None:
+            return self._params
+        return self._params + (self._limit,)
+
+    def to_sql(self) -> str:
+        """Returns the SQL of the ``SELECT`` query."""
+        return self._compile_select()
+
+    def _shards(self) -> list:
+        """Returns the shard pools that can hold the matched rows,
+        only the owning shards when filtering on the shard key."""
+        model = self.model
+        params = iter(self._params)
+        for name, op in self._conditions:
+            if op in ("isnull", "notnull"):
+                continue
+
+            value = next(params)
+            if name == model.shard_key:
+                if op == "eq":
+                    return model._shard_pools([value])
+                if op == "in":
+                    return model._shard_pools(value)
+
+        return model._shard_pools()
+
+    async def _fetch(
+        self, sql: str, params: tuple, order: tuple, limit: Optional[int]
+    ) -> list:
+        if self.model.shard_key is None:
+            pool = self.model._get_pool(readonly=True)
+            return await run(self.model, pool, "fetch", sql, *params)
+
+        self._check_merge_order(order)
+        results = await gather(
+            *(run(self.model, pool, "fetch", sql, *params) for pool in self._shards())
+        )
+        return merge_records(results, order, limit)
+
+    def _check_merge_order(self, order: tuple) -> None:
+        if self._columns is not None and not {name for name, _ in order} <= set(
+            self._columns
+        ):
+            raise ValueError(
+                "The ordering columns must be selected to merge the results of the shards."
+            )
+
+    async def _execute(self, sql: str, params: tuple) -> str:
+        if self.model.shard_key is None:
+            pool = self.model._get_pool()
+            return await run(self.model, pool, "execute", sql, *params)
+
+        statuses = await gather(
+            *(run(self.model, pool, "execute", sql, *params) for pool in self._shards())
+        )
+        return merge_status(statuses, sql.split(None, 1)[0].upper())
+
+    async def fetch(self, *, lazy: bool = False) -> List["Model"]:
+        """Execute the query and return the model instances.
+
+        On sharded models the query runs on every shard that can hold
+        matching rows concurrently, and the results are merged."""
+        records = await self._fetch(
+            self._compile_select(), self._select_params(), self._order, self._limit
+        )
+        instances = self.model.from_records(records, lazy=lazy)
+        await self._load_related(instances)
+        return instances
+
+    async def fetchrow(self, *, lazy: bool = False) -> Optional["Model"]:
+        """Execute the query and return the first instance, or ``None``."""
+        sql, params = self._compile_select(), self._select_params()
+        if self.model.shard_key is None:
+            pool = self.model._get_pool(readonly=True)
+            record = await run(self.model, pool, "fetchrow", sql, *params)
+        else:
+            self._check_merge_order(self._order)
+            results = await gather(
+                *(
+                    run(self.model, pool, "fetchrow", sql, *params)
+                    for pool in self._shards()
+                )
+            )
+            records = merge_records(
+                [[record] for record in results if record is not None], self._order, 1
+            )
+            record = records[0] if records else None
+
+        if record is None:
+            return None
+
+        instance = self.model.from_record(record, lazy=lazy)
+        await self._load_related([instance])
+        return instance
+
+    def stream(
+        self,
+        *,
+        prefetch: int = 1000,
+        batch_size: Optional[int] = None,
+        lazy: bool = False,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[Union["Model", List["Model"]]]:
+        """Iterate over the result with a server-side cursor, see :meth:`Model.stream`.
+
+        On sharded models the shards are read one after the other,
+        so the ordering only holds within each shard."""
+        return self.model._stream(
+            self._compile_select(),
+            self._select_params(),
+            pools=self._shards() if self.model.shard_key is not None else None,
+            prefetch=prefetch,
+            batch_size=batch_size,
+            lazy=lazy,
+            timeout=timeout,
+        )
+
+    @staticmethod
+    def _decode_token(after: str, size: int) -> dict:
+        # Tokens come back from clients, anything but a token of paginate is invalid.
+        try:
+            token = json.loads(base64.urlsafe_b64decode(after.encode()))
+        except (ValueError, TypeError, AttributeError):
+            raise ValueError("Invalid after token.") from None
+
+        if (
+            not isinstance(token, dict)
+            or not isinstance(token.get("order"), list)
+            or not isinstance(token.get("values"), list)
+            or len(token["values"]) != size
+            or not all(isinstance(value, str) for value in token["values"])
+        ):
+            raise ValueError("Invalid after token.")
+
+        return token
+
+    async def paginate(
+        self,
+        order_by: Sequence[str] = (),
+        *,
+        after: Optional[str] = None,
+        limit: int = 50,
+        lazy: bool = False,
+    ) -> Page:
+        """Fetch a page of the result using keyset (seek) pagination.
+
+        ``order_by`` works like :meth:`order_by`, the primary key is appended
+        as a tiebreaker so the ordering is unique. Pass the ``after`` token of
+        the returned :class:`Page` to get the next page, which is ``None`` on the
+        last page. Rather than an ``OFFSET`` the previous page's last row is used
+        as a ``WHERE`` bound, so every page costs the same given an index
+        on the ordering columns. The ordering columns must not be ``NULL``.
+        """
+        if limit < 1:
+            raise ValueError("limit must be greater than 0")
+
+        order = self.order_by(*order_by)._order
+        names = [name for name, _ in order]
+        for pk in self.model.schema.primary_key:
+            if pk not in names:
+                order += ((pk, order[-1][1] if order else "ASC"),)
+                names.append(pk)
+
+        if not order:
+            raise SchemaError(
+                "Cannot paginate %s without ordering columns or a primary key."
+                % self.model.__name__
+            )
+
+        if self._columns is not None and not set(names) <= set(self._columns):
+            raise ValueError("The ordering columns must be selected to paginate.")
+
+        by_name = self.model.schema.by_name
+        leading = {index.elements[0] for index in self.model.indexes}
+        for name in names:
+            col = by_name[name]
+            if not (name in leading or col.primary_key or col.unique):
+                warnings.warn(
+                    "%s.%s has no index, paginating on it scans the table."
+                    % (self.model.__name__, name),
+                    stacklevel=3,
+                )
+
+        signature = ["-" + name if way == "DESC" else name for name, way in order]
+        params = self._params
+        if after is not None:
+            token = self._decode_token(after, len(names))
+            if token["order"] != signature:
+                raise ValueError("The after token was created with a different order.")
+            params += tuple(token["values"])
+
+        key = ("PAGINATE", self._columns, self._conditions, order, after is not None)
+        cache = self.model._query_cache
+        try:
+            sql = cache[key]
+        except KeyError:
+            extra = ()
+            if after is not None:
+                start = len(self._params) + 1
+                bounds = [
+                    "$%d::TEXT::%s"
+                    % (start + i, by_name[name].column_type.to_base_sql())
+                    for i, name in enumerate(names)
+                ]
+
+                if len({way for _, way in order}) == 1:
+                    extra = (
+                        "(%s) %s (%s)"
+                        % (
+                            ", ".join(names),
+                            ">" if order[0][1] == "ASC" else "<",
+                            ", ".join(bounds),
+                        ),
+                    )
+                else:
+                    # Mixed directions can't use a row comparison,
+                    # expand it to (a > x) OR (a = x AND b < y) OR ...
+                    alternatives = []
+                    for i, (name, way) in enumerate(order):
+                        equal = ["%s = %s" % (names[j], bounds[j]) for j in range(i)]
+                        equal.append(
+                            "%s %s %s" % (name, ">" if way == "ASC" else "<", bounds[i])
+                        )
+                        alternatives.append("(%s)" % " AND ".join(equal))
+                    extra = ("(%s)" % " OR ".join(alternatives),)
+
+            sql = "SELECT %s FROM %s" % (
+                ", ".join(self._columns) if self._columns else "*",
+                self.model.__tablename__,
+            )
+            sql += self._compile_where(1, extra)
+            sql += " ORDER BY " + ", ".join("%s %s" % pair for pair in order)
+            sql += " LIMIT $%d" % (len(params) + 1)
+            cache[key] = sql
+
+        records = await self._fetch(sql, params + (limit + 1,), order, limit + 1)
+
+        token = None
+        if len(records) > limit:
+            records = records[:limit]
+            last = records[-1]
+            values = []
+            for name in names:
+                value = last[name]
+                if value is None:
+                    raise ValueError("Cannot paginate on NULL values of %s." % name)
+                values.append(str(value))
+
+            token = base64.urlsafe_b64encode(
+                json.dumps({"order": signature, "values": values}).encode()
+            ).decode()
+
+        instances = self.model.from_records(records, lazy=lazy)
+        await self._load_related(instances)
+        return Page(instances, token)
+
+    async def update(self, **values) -> str:
+        """Update the matched rows with the given column values."""
+        if not values:
+            raise ValueError("update() requires at least one column to update.")
+
+        columns = tuple(self._check_column(name) for name in values)
+
+        key = ("UPDATE", columns, self._conditions)
+        cache = self.model._query_cache
+        try:
+            sql = cache[key]
+        except KeyError:
+            sql = "UPDATE %s SET %s" % (
+                self.model.__tablename__,
+                ", ".join("%s = $%d" % (name, i) for i, name in enumerate(columns, 1)),
+            )
+            sql += self._compile_where(len(columns) + 1)
+            cache[key] = sql
+
+        try:
+            return await self._execute(sql, (*values.values(), *self._params))
+        finally:
+            self._invalidate()
+
+    async def delete(self) -> str:
+        """Delete the matched rows."""
+        key = ("DELETE", self._conditions)
+        cache = self.model._query_cache
+        try:
+            sql = cache[key]
+        except KeyError:
+            sql = "DELETE FROM %s" % self.model.__tablename__
+            sql += self._compile_where(1)
+            cache[key] = sql
+
+        try:
+            return await self._execute(sql, self._params)
+        finally:
+            self._invalidate()
+
+    def _invalidate(self):
+        """Invalidate the cached instances affected by a write,
+        only a single key when filtering on the whole primary key."""
+        if self.model.cache is None:
+            return
+
+        pks = self.model.schema.primary_key
+        params = iter(self._params)
+        equal = {}
+        for name, op in self._conditions:
+            if op in ("isnull", "notnull"):
+                continue
+
+            value = next(params)
+            if op == "eq":
+                equal[name] = value
+
+        if len(self._conditions) == len(pks) and equal.keys() == set(pks):
+            self.model._invalidate([tuple(equal[name] for name in pks)])
+        else:
+            self.model._invalidate()
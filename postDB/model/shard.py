@@ -0,0 +1,64 @@
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple
+import zlib
+
+
+def shard_index(value: Any, shards: int) -> int:
+    """Returns the index of the shard owning ``value``.
+
+    Uses a CRC32 of the ``repr`` so the placement is stable
+    across processes, unlike :func:`hash` of strings."""
+    return zlib.crc32(repr(value).encode()) % shards
+
+
+def null_last(name: str) -> Callable[[Any], Tuple[bool, Any]]:
+    """Returns a sort key for the column ``name`` placing ``NULL`` after the
+    other values, like PostgreSQL does in ascending order and, once reversed,
+    before them in descending order."""
+
+    def key(record) -> Tuple[bool, Any]:
+        value = record[name]
+        return value is None, value
+
+    return key
+
+
+def merge_records(
+    results: Sequence[Sequence],
+    order: Tuple[Tuple[str, str], ...] = (),
+    limit: Optional[int] = None,
+) -> List:
+    """Merge the results of a query run on several shards,
+    applying the ``ORDER BY`` and ``LIMIT`` of the query again."""
+    records = [record for result in results for record in result]
+
+    # Stable sorts from the last key to the first handle mixed directions.
+    for name, way in reversed(order):
+        records.sort(key=null_last(name), reverse=way == "DESC")
+
+    if limit is not None:
+        del records[limit:]
+
+    return records
+
+
+def merge_status(statuses: Sequence[str], command: str) -> str:
+    """Merge command statuses like ``"UPDATE 3"`` by summing the row counts,
+    ``"{command} 0"`` when no shard ran the statement."""
+    if not statuses:
+        return "%s 0" % command
+
+    command, _, _ = statuses[0].rpartition(" ")
+    total = 0
+    for status in statuses:
+        total += int(status.rpartition(" ")[2] or 0)
+    return "%s %d" % (command, total)
+
+
+async def gather(*aws: Awaitable) -> List:
+    """Run the awaitables of the shards concurrently, see :func:`asyncio.gather`.
+
+    :mod:`asyncio` is imported here so ``import postDB`` doesn't pay for it,
+    by the time a query runs it is loaded anyway."""
+    import asyncio
+
+    return await asyncio.gather(*aws)
@@ -0,0 +1,326 @@
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+    TYPE_CHECKING,
+)
+from contextlib import asynccontextmanager
+import asyncio
+import datetime
+import decimal
+
+from postDB import types
+
+if TYPE_CHECKING:
+    from postDB.model.model import Model
+
+
+Rows = Union[Sequence[Mapping[str, Any]], Callable[[str, tuple], Sequence[Mapping]]]
+
+
+class FakeRecord:
+    """Stand-in for :class:`asyncpg.Record`, indexable by position and by name."""
+
+    __slots__ = ("_keys", "_values")
+
+    def __init__(self, data: Mapping[str, Any]):
+        self._keys: Dict[str, int] = {key: i for i, key in enumerate(data)}
+        self._values: Tuple = tuple(data.values())
+
+    def __getitem__(self, key: Union[int, str, slice]) -> Any:
+        if isinstance(key, str):
+            return self._values[self._keys[key]]
+        return self._values[key]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, FakeRecord):
+            return self._keys == other._keys and self._values == other._values
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return "<FakeRecord %s>" % " ".join(
+            "%s=%r" % item for item in zip(self._keys, self._values)
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> Iterable[str]:
+        return iter(self._keys)
+
+    def values(self) -> Iterable[Any]:
+        return iter(self._values)
+
+    def items(self) -> Iterable[Tuple[str, Any]]:
+        return zip(self._keys, self._values)
+
+
+def generate_rows(model: Type["Model"], amount: int) -> List[FakeRecord]:
+    """Returns ``amount`` records with a value for every column of ``model``."""
+    samples = {
+        bool: lambda i: i % 2 == 0,
+        int: lambda i: i,
+        float: lambda i: i / 2,
+        str: lambda i: "value %d" % i,
+        bytes: lambda i: b"%d" % i,
+        decimal.Decimal: lambda i: decimal.Decimal(i) / 100,
+        datetime.datetime: lambda i: datetime.datetime(2020, 1, 1)
+        + datetime.timedelta(seconds=i),
+        datetime.date: lambda i: datetime.date(2020, 1, 1),
+        datetime.time: lambda i: datetime.time(12),
+        datetime.timedelta: lambda i: datetime.timedelta(seconds=i),
+        dict: lambda i: {"i": i},
+        list: lambda i: [i],
+    }
+
+    def sample(column, i: int) -> Any:
+        column_type = column.column_type
+        if isinstance(column_type, types.ForeignKey):
+            return i
+        return samples.get(column_type.python, lambda i: None)(i)
+
+    return [
+        FakeRecord({col.name: sample(col, i) for col in model.columns})
+        for i in range(1, amount + 1)
+    ]
+
+
+class FakeCursor:
+    __slots__ = ("records",)
+
+    def __init__(self, records: List[FakeRecord]):
+        self.records = records
+
+    async def fetch(self, n: int, *, timeout: Optional[float] = None):
+        batch = self.records[:n]
+        del self.records[:n]
+        return batch
+
+
+class FakeCursorFactory:
+    """Returned by :meth:`FakeConnection.cursor`, iterable and awaitable like in asyncpg."""
+
+    __slots__ = ("connection", "sql", "args")
+
+    def __init__(self, connection: "FakeConnection", sql: str, args: tuple):
+        self.connection = connection
+        self.sql = sql
+        self.args = args
+
+    async def __aiter__(self) -> AsyncIterator[FakeRecord]:
+        for record in await self.connection.fetch(self.sql, *self.args):
+            yield record
+
+    def __await__(self):
+        return self._cursor().__await__()
+
+    async def _cursor(self) -> FakeCursor:
+        return FakeCursor(list(await self.connection.fetch(self.sql, *self.args)))
+
+
+class FakeConnection:
+    """A connection of a :class:`FakePool`, every query is answered by the pool."""
+
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+        self.listeners: Dict[str, List[Callable]] = {}
+
+    async def execute(self, sql: str, *args, timeout: Optional[float] = None) -> str:
+        return await self.pool.execute(sql, *args, timeout=timeout)
+
+    async def fetch(self, sql: str, *args, timeout: Optional[float] = None):
+        return await self.pool.fetch(sql, *args, timeout=timeout)
+
+    async def fetchrow(self, sql: str, *args, timeout: Optional[float] = None):
+        return await self.pool.fetchrow(sql, *args, timeout=timeout)
+
+    async def fetchval(self, sql: str, *args, column: int = 0, timeout=None):
+        return await self.pool.fetchval(sql, *args, column=column, timeout=timeout)
+
+    async def copy_records_to_table(
+        self, table_name: str, *, records, columns=None, timeout=None, **kwargs
+    ) -> str:
+        return await self.pool.copy_records_to_table(
+            table_name, records=records, columns=columns, timeout=timeout
+        )
+
+    def cursor(self, sql: str, *args, prefetch=None, timeout=None):
+        return FakeCursorFactory(self, sql, args)
+
+    @asynccontextmanager
+    async def transaction(self, **kwargs) -> AsyncIterator[None]:
+        self.pool.log("transaction", "BEGIN", ())
+        try:
+            yield
+        except BaseException:
+            self.pool.log("transaction", "ROLLBACK", ())
+            raise
+        self.pool.log("transaction", "COMMIT", ())
+
+    async def set_type_codec(self, *args, **kwargs) -> None:
+        pass
+
+    async def add_listener(self, channel: str, callback: Callable) -> None:
+        self.listeners.setdefault(channel, []).append(callback)
+
+    async def remove_listener(self, channel: str, callback: Callable) -> None:
+        self.listeners.get(channel, []).remove(callback)
+
+    def add_termination_listener(self, callback: Callable) -> None:
+        pass
+
+    def remove_termination_listener(self, callback: Callable) -> None:
+        pass
+
+    def notify(self, channel: str, payload: str) -> None:
+        """Call the listeners of ``channel``, as a ``NOTIFY`` would."""
+        for callback in list(self.listeners.get(channel, ())):
+            callback(self, 0, channel, payload)
+
+
+class _AcquireContext:
+    __slots__ = ("pool", "connection")
+
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+        self.connection = None
+
+    def __await__(self):
+        return self.pool._acquire().__await__()
+
+    async def __aenter__(self) -> FakeConnection:
+        self.connection = await self.pool._acquire()
+        return self.connection
+
+    async def __aexit__(self, *exc) -> None:
+        await self.pool.release(self.connection)
+
+
+class FakePool:
+    """In-process stand-in for :class:`asyncpg.pool.Pool`, to run postDB without a database.
+
+    Implements the part of the pool and connection interface postDB uses.
+    ``rows`` answers every ``fetch``, either a sequence of mappings returned
+    as :class:`FakeRecord` for every query, or a callable taking the SQL
+    and the arguments and returning them. ``latency`` adds a delay,
+    in seconds, to every query. Every query is logged in :attr:`queries`.
+
+    .. code-block:: python3
+
+        from postDB.testing import FakePool, generate_rows
+
+        Model.pool = FakePool(generate_rows(User, 1000))
+        users = await User.select().fetch()
+    """
+
+    def __init__(self, rows: Rows = (), *, latency: float = 0.0, max_size: int = 10):
+        if not callable(rows):
+            rows = [
+                row if isinstance(row, FakeRecord) else FakeRecord(row) for row in rows
+            ]
+        self.rows = rows
+        self.latency = latency
+        self.max_size = max_size
+        self.in_use = 0
+        #: The ``(method, sql, args)`` of every query, in order.
+        self.queries: List[Tuple[str, str, tuple]] = []
+        #: The records copied with ``copy_records_to_table``, by table.
+        self.copied: Dict[str, List[tuple]] = {}
+        self.closed = False
+
+    def log(self, method: str, sql: str, args: tuple) -> None:
+        self.queries.append((method, sql, args))
+
+    async def _query(self, method: str, sql: str, args: tuple) -> List[FakeRecord]:
+        self.log(method, sql, args)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if not callable(self.rows):
+            return list(self.rows)
+
+        return [
+            row if isinstance(row, FakeRecord) else FakeRecord(row)
+            for row in self.rows(sql, args)
+        ]
+
+    async def execute(self, sql: str, *args, timeout: Optional[float] = None) -> str:
+        rows = await self._query("execute", sql, args)
+        words = sql.split(None, 2)
+        command = words[0].upper() if words else ""
+
+        if command in ("SELECT", "UPDATE", "DELETE"):
+            return "%s %d" % (command, len(rows))
+        if command == "INSERT":
+            return "INSERT 0 %d" % len(rows)
+        if command in ("CREATE", "DROP", "ALTER") and len(words) > 1:
+            return "%s %s" % (command, words[1].upper())
+        return command
+
+    async def fetch(self, sql: str, *args, timeout: Optional[float] = None):
+        return await self._query("fetch", sql, args)
+
+    async def fetchrow(self, sql: str, *args, timeout: Optional[float] = None):
+        rows = await self._query("fetchrow", sql, args)
+        return rows[0] if rows else None
+
+    async def fetchval(self, sql: str, *args, column: int = 0, timeout=None):
+        rows = await self._query("fetchval", sql, args)
+        return rows[0][column] if rows else None
+
+    async def copy_records_to_table(
+        self, table_name: str, *, records, columns=None, timeout=None, **kwargs
+    ) -> str:
+        records = list(records)
+        self.log("copy_records_to_table", table_name, (columns,))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        self.copied.setdefault(table_name, []).extend(records)
+        return "COPY %d" % len(records)
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _AcquireContext:
+        return _AcquireContext(self)
+
+    async def _acquire(self) -> FakeConnection:
+        self.in_use += 1
+        return FakeConnection(self)
+
+    async def release(self, connection: FakeConnection, **kwargs) -> None:
+        self.in_use -= 1
+
+    async def close(self) -> None:
+        self.closed = True
+
+    def get_size(self) -> int:
+        return self.max_size
+
+    def get_idle_size(self) -> int:
+        return self.max_size - self.in_use
+
+    def get_min_size(self) -> int:
+        return 0
+
+    def get_max_size(self) -> int:
+        return self.max_size
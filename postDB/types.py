@@ -1,12 +1,37 @@
 from typing import Optional, Union, Type
+import importlib
 import datetime
-import inspect
 import decimal
-import pydoc
+import sys
 
 from postDB.exceptions import SchemaError
 
 
+def _locate(path: str) -> Optional[type]:
+    """Returns the object at the dotted ``path``, importing its module if needed.
+
+    Like :func:`pydoc.locate`, without importing :mod:`pydoc`."""
+    parts = path.split(".")
+    for i in range(len(parts) - 1, 0, -1):
+        name = ".".join(parts[:i])
+        module = sys.modules.get(name)
+        if module is None:
+            try:
+                module = importlib.import_module(name)
+            except ImportError:
+                continue
+
+        obj = module
+        try:
+            for attr in parts[i:]:
+                obj = getattr(obj, attr)
+        except AttributeError:
+            return None
+        return obj
+
+    return None
+
+
 class SQLType:
     """Base class for all the other types."""
 
@@ -25,7 +50,7 @@ class SQLType:
         meta = data.pop("__meta__")
         given = cls.__module__ + "." + cls.__qualname__
         if given != meta:
-            cls = pydoc.locate(meta)
+            cls = _locate(meta)
             if cls is None:
                 raise RuntimeError('Could not locate "%s".' % meta)
 
@@ -43,6 +68,11 @@ class SQLType:
         """Returns the SQL of the type."""
         raise NotImplementedError()
 
+    def to_base_sql(self) -> str:
+        """Returns the SQL of the underlying data type,
+        usable in casts like ``$1::{type}[]``."""
+        return self.to_sql()
+
     def is_real_type(self) -> bool:
         """Returns a bool stating if the type is a real PostgreSQL type
         or if it has been defined as a type for ease of use"""
@@ -145,6 +175,9 @@ class Serial(Integer):
 
         return "SERIAL"
 
+    def to_base_sql(self):
+        return super().to_sql()
+
     def is_real_type(self):
         return False
 
@@ -277,6 +310,14 @@ class JSON(SQLType):
         return "JSON"
 
 
+class JSONB(JSON):
+    """Type for python :class:`dict`. ``JSONB`` in PostgreSQL,
+    stored decomposed so it can be indexed and queried efficiently."""
+
+    def to_sql(self):
+        return "JSONB"
+
+
 class ForeignKey(SQLType):
     """Reference to another column in another model."""
 
@@ -317,7 +358,7 @@ class ForeignKey(SQLType):
         if sql_type is None:
             sql_type = Integer
 
-        if inspect.isclass(sql_type):
+        if isinstance(sql_type, type):
             sql_type = sql_type()
 
         if not isinstance(sql_type, SQLType):
@@ -331,6 +372,9 @@ class ForeignKey(SQLType):
     def is_real_type(self):
         return False
 
+    def to_base_sql(self):
+        return self.sql_type
+
     def to_sql(self):
         fmt = (
             "{0.sql_type} REFERENCES {0.model}({0.column})"
@@ -345,7 +389,7 @@ class Array(SQLType):
     python = list
 
     def __init__(self, sql_type: Union[Type[SQLType], SQLType]):
-        if inspect.isclass(sql_type):
+        if isinstance(sql_type, type):
             sql_type = sql_type()
 
         if not isinstance(sql_type, SQLType):